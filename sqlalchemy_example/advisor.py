@@ -0,0 +1,110 @@
+import re
+from collections import namedtuple
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from sqlalchemy_example.models import Base
+
+Advice = namedtuple('Advice', ['statement', 'table', 'rows', 'detail', 'suggestion'])
+
+# "SCAN customer" on SQLite >= 3.36, "SCAN TABLE customer" before that; a
+# scan "USING INDEX" or "USING COVERING INDEX" is already index-backed
+_SCAN = re.compile(r'^SCAN (?:TABLE )?"?(\w+)"?(?: AS (\w+))?$')
+_CLAUSES = re.compile(r'\b(WHERE|ON|GROUP BY|ORDER BY|HAVING|LIMIT)\b')
+
+
+class IndexAdvisor(object):
+    """Capture the SELECT statements an engine runs, record the SQLite query
+    plan of each and suggest indexes for full scans of large tables."""
+
+    def __init__(self, min_rows=1000):
+        self.min_rows = min_rows
+        self.plans = {}
+        self._row_counts = {}
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if executemany or statement in self.plans:
+            return
+        if not statement.lstrip().upper().startswith('SELECT'):
+            return
+        dbapi_connection = cursor.connection
+        plan = dbapi_connection.execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+        details = [row[-1] for row in plan]
+        self.plans[statement] = details
+        for detail in details:
+            match = _SCAN.match(detail)
+            # subqueries and CTEs are scanned under their alias, which is
+            # not a table that can be counted
+            table = match.group(1) if match else None
+            if table in Base.metadata.tables and table not in self._row_counts:
+                self._row_counts[table] = dbapi_connection.execute(
+                    'SELECT count(*) FROM "%s"' % table).fetchone()[0]
+
+    @contextmanager
+    def capture(self, engine):
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        try:
+            yield self
+        finally:
+            event.remove(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def advice(self):
+        results = []
+        for statement, details in self.plans.items():
+            for detail in details:
+                match = _SCAN.match(detail)
+                if not match or match.group(1) not in Base.metadata.tables:
+                    continue
+                table, alias = match.group(1), match.group(2) or match.group(1)
+                rows = self._row_counts.get(table, 0)
+                if rows < self.min_rows:
+                    continue
+                results.append(Advice(statement, table, rows, detail,
+                                      suggest_index(statement, table, alias)))
+        return sorted(results, key=lambda advice: advice.rows, reverse=True)
+
+    def report(self):
+        lines = []
+        for advice in self.advice():
+            lines.append('%s (%d rows): %s' % (advice.detail, advice.rows,
+                                               advice.suggestion or 'no filter or sort columns'))
+            lines.append('    ' + ' '.join(advice.statement.split()))
+        return '\n'.join(lines)
+
+
+def _referenced_columns(sql, table, alias):
+    columns = Base.metadata.tables[table].columns
+    pattern = re.compile(r'"?%s"?\."?(\w+)"?' % re.escape(alias))
+    return [name for name in pattern.findall(sql) if name in columns]
+
+
+def suggest_index(statement, table, alias=None, max_columns=4):
+    """Suggest an index for table: filter and join columns first, then
+    grouping and ordering columns, then - if the result stays within
+    max_columns, making the index covering - the remaining columns the
+    statement reads."""
+    alias = alias or table
+    parts = _CLAUSES.split(statement)
+    selected = _referenced_columns(parts[0], table, alias)
+    filters, sorts = [], []
+    for keyword, sql in zip(parts[1::2], parts[2::2]):
+        target = filters if keyword in ('WHERE', 'ON') else sorts
+        target.extend(_referenced_columns(sql, table, alias))
+    if not filters and not sorts:
+        return None
+    # an INTEGER PRIMARY KEY is the rowid, which every index already carries
+    primary_key = list(Base.metadata.tables[table].primary_key)
+    rowid = primary_key[0].name if len(primary_key) == 1 else None
+    ordered = []
+    for name in filters + sorts:
+        if name not in ordered and name != rowid:
+            ordered.append(name)
+    covering = ordered + [name for name in dict.fromkeys(selected)
+                          if name not in ordered and name != rowid]
+    if len(covering) <= max_columns:
+        ordered = covering
+    if not ordered:
+        return None
+    return 'CREATE INDEX ix_%s_%s ON "%s" (%s)' % (table, '_'.join(ordered), table,
+                                                   ', '.join(ordered))
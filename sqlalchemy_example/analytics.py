@@ -0,0 +1,192 @@
+from collections import namedtuple
+
+import numpy as np
+from sqlalchemy import String, event, select, type_coerce
+
+from sqlalchemy_example.models import Order, Order_Item, Product, Stock
+
+EXTRACT = 'analytics_extract'
+
+# every table as a dict of equal length column arrays; items also carries
+# the store_id, order_date, month, brand_id and category_id of each item
+Extract = namedtuple('Extract', ['items', 'orders', 'products', 'stock'])
+
+Grouped = namedtuple('Grouped', ['keys', 'values'])
+DiscountImpact = namedtuple('DiscountImpact', ['keys', 'gross', 'discount', 'net', 'rate'])
+Baskets = namedtuple('Baskets', ['order_ids', 'items', 'units', 'revenue'])
+Turnover = namedtuple('Turnover', ['store_ids', 'sold', 'in_stock', 'turnover'])
+Lateness = namedtuple('Lateness', ['store_ids', 'shipped', 'late', 'mean_days', 'max_days'])
+
+
+def _columns(session, statement, dtypes):
+    rows = session.execute(statement).all()
+    columns = list(zip(*rows)) or [()] * len(dtypes)
+    return {name: np.array(column, dtype=dtype)
+            for (name, dtype), column in zip(dtypes.items(), columns)}
+
+
+def _dates(column):
+    # dates are read as their stored ISO strings, which numpy parses in one
+    # pass far faster than building a datetime.date per value
+    return type_coerce(column, String)
+
+
+def _nullable_dates(values):
+    return np.array(['NaT' if value is None else value for value in values],
+                    dtype='datetime64[D]')
+
+
+def _lookup(keys, sorted_keys):
+    return np.searchsorted(sorted_keys, keys)
+
+
+def build_extract(session):
+    """Read order_item, order, product and stock into column arrays."""
+    items = _columns(session,
+                     select(Order_Item.order_id, Order_Item.item_id, Order_Item.product_id,
+                            Order_Item.quantity, Order_Item.list_price, Order_Item.discount)
+                     .order_by(Order_Item.order_id, Order_Item.item_id),
+                     dict(order_id=np.int64, item_id=np.int64, product_id=np.int64,
+                          quantity=np.int64, list_price=np.float64, discount=np.float64))
+    rows = session.execute(select(Order.order_id, Order.customer_id, Order.store_id,
+                                  Order.staff_id, _dates(Order.order_date),
+                                  _dates(Order.required_date), _dates(Order.shipped_date))
+                           .order_by(Order.order_id)).all()
+    columns = list(zip(*rows)) or [()] * 7
+    orders = dict(order_id=np.array(columns[0], dtype=np.int64),
+                  customer_id=np.array([-1 if value is None else value for value in columns[1]],
+                                       dtype=np.int64),
+                  store_id=np.array(columns[2], dtype=np.int64),
+                  staff_id=np.array(columns[3], dtype=np.int64),
+                  order_date=np.array(columns[4], dtype='datetime64[D]'),
+                  required_date=np.array(columns[5], dtype='datetime64[D]'),
+                  shipped_date=_nullable_dates(columns[6]))
+    products = _columns(session,
+                        select(Product.product_id, Product.brand_id, Product.category_id,
+                               Product.model_year, Product.list_price)
+                        .order_by(Product.product_id),
+                        dict(product_id=np.int64, brand_id=np.int64, category_id=np.int64,
+                             model_year=np.int64, list_price=np.float64))
+    stock = _columns(session,
+                     select(Stock.store_id, Stock.product_id, Stock.quantity)
+                     .order_by(Stock.store_id, Stock.product_id),
+                     dict(store_id=np.int64, product_id=np.int64, quantity=np.float64))
+    stock['quantity'] = np.nan_to_num(stock['quantity']).astype(np.int64)
+
+    order_index = _lookup(items['order_id'], orders['order_id'])
+    product_index = _lookup(items['product_id'], products['product_id'])
+    items['store_id'] = orders['store_id'][order_index]
+    items['order_date'] = orders['order_date'][order_index]
+    items['month'] = items['order_date'].astype('datetime64[M]')
+    items['brand_id'] = products['brand_id'][product_index]
+    items['category_id'] = products['category_id'][product_index]
+    return Extract(items, orders, products, stock)
+
+
+def _invalidate(session, *args):
+    session.info.pop(EXTRACT, None)
+
+
+def _invalidate_on_write(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info.pop(EXTRACT, None)
+
+
+def extract(session, cache=False):
+    """Return the Extract for session's database. With cache=True it is built
+    once and reused until the session flushes, rolls back or executes an
+    INSERT, UPDATE or DELETE; changes committed by other connections are not
+    seen until then."""
+    if not cache:
+        return build_extract(session)
+    if EXTRACT not in session.info:
+        if not event.contains(session, 'after_flush', _invalidate):
+            event.listen(session, 'after_flush', _invalidate)
+            event.listen(session, 'after_soft_rollback', _invalidate)
+            event.listen(session, 'do_orm_execute', _invalidate_on_write)
+        session.info[EXTRACT] = build_extract(session)
+    return session.info[EXTRACT]
+
+
+def group_sum(keys, *values):
+    """Sum each of values per distinct key; returns the sorted keys followed
+    by one array of totals per value."""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return (unique,) + tuple(np.bincount(inverse, weights=value, minlength=len(unique))
+                             for value in values)
+
+
+def item_revenue(extract):
+    items = extract.items
+    return items['quantity'] * items['list_price'] * (1 - items['discount'])
+
+
+def revenue(extract, by=None):
+    """Total revenue, or a Grouped of revenue per value of the item column
+    named by, e.g. 'store_id', 'brand_id', 'category_id' or 'month'."""
+    values = item_revenue(extract)
+    if by is None:
+        return values.sum()
+    keys, totals = group_sum(extract.items[by], values)
+    return Grouped(keys, totals)
+
+
+def discount_impact(extract, by='category_id'):
+    """Gross (list price) revenue, the amount given away as discount and the
+    net revenue per value of the item column named by, with the discount as
+    a fraction of gross."""
+    items = extract.items
+    gross = items['quantity'] * items['list_price']
+    discount = gross * items['discount']
+    keys, gross, discount = group_sum(items[by], gross, discount)
+    return DiscountImpact(keys, gross, discount, gross - discount,
+                          np.divide(discount, gross, out=np.zeros_like(gross), where=gross > 0))
+
+
+def basket_sizes(extract):
+    """The number of lines, units and revenue of every order with items."""
+    items = extract.items
+    order_ids, lines, units, totals = group_sum(items['order_id'], np.ones(len(items['order_id'])),
+                                                items['quantity'], item_revenue(extract))
+    return Baskets(order_ids, lines.astype(np.int64), units.astype(np.int64), totals)
+
+
+def stock_turnover(extract):
+    """Units sold against units currently in stock for every store; turnover
+    is sold / in_stock, inf for a store with sales but no stock left."""
+    stock = extract.stock
+    store_ids = np.union1d(extract.items['store_id'], stock['store_id'])
+    sold = np.zeros(len(store_ids))
+    in_stock = np.zeros(len(store_ids))
+    keys, totals = group_sum(extract.items['store_id'], extract.items['quantity'])
+    sold[np.searchsorted(store_ids, keys)] = totals
+    keys, totals = group_sum(stock['store_id'], stock['quantity'])
+    in_stock[np.searchsorted(store_ids, keys)] = totals
+    with np.errstate(divide='ignore', invalid='ignore'):
+        turnover = np.where(in_stock > 0, sold / in_stock, np.where(sold > 0, np.inf, 0.0))
+    return Turnover(store_ids, sold.astype(np.int64), in_stock.astype(np.int64), turnover)
+
+
+def order_lateness(extract):
+    """shipped_date - required_date in days for every order, NaN for orders
+    that have not shipped; positive values were shipped late."""
+    orders = extract.orders
+    days = (orders['shipped_date'] - orders['required_date']).astype(np.float64)
+    days[np.isnat(orders['shipped_date'])] = np.nan
+    return orders['order_id'], days
+
+
+def shipping_lateness(extract):
+    """Per store: shipped orders, how many shipped late, and the mean and
+    maximum lateness in days of the late ones."""
+    days = order_lateness(extract)[1]
+    shipped = ~np.isnan(days)
+    store_ids = extract.orders['store_id'][shipped]
+    days = days[shipped]
+    late = days > 0
+    keys, counts, late_counts, late_days = group_sum(store_ids, np.ones(len(days)), late,
+                                                     np.where(late, days, 0.0))
+    maximum = np.zeros(len(keys))
+    np.maximum.at(maximum, np.searchsorted(keys, store_ids), np.where(late, days, 0.0))
+    mean = np.divide(late_days, late_counts, out=np.zeros_like(late_days), where=late_counts > 0)
+    return Lateness(keys, counts.astype(np.int64), late_counts.astype(np.int64), mean, maximum)
@@ -0,0 +1,98 @@
+import asyncio
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from sqlalchemy_example.load_data import (DEFAULT_BATCH_SIZE, SOURCES, batches, model_for,
+                                          read_rows)
+from sqlalchemy_example.loading import use_profile
+from sqlalchemy_example.models import Base
+
+# chunks parsed ahead of the writer per table; bounds memory while letting
+# file reading and parsing overlap with the inserts
+DEFAULT_QUEUE_SIZE = 2
+
+_DONE = object()
+
+
+def _enable_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('''PRAGMA foreign_keys = ON;''')
+    cursor.close()
+
+
+async def _produce(table_name, data_dir, batch_size, queue):
+    # csv parsing is blocking, so each chunk is read on a worker thread
+    loop = asyncio.get_running_loop()
+    chunks = batches(read_rows(table_name, data_dir), batch_size)
+    while True:
+        chunk = await loop.run_in_executor(None, next, chunks, _DONE)
+        await queue.put(chunk)
+        if chunk is _DONE:
+            return
+
+
+async def _consume(session, table_name, queue, bulk):
+    model = model_for(table_name)
+    while True:
+        chunk = await queue.get()
+        if chunk is _DONE:
+            break
+        if bulk:
+            await session.execute(model.__table__.insert(), chunk)
+        else:
+            instances = [model(**row) for row in chunk]
+            session.add_all(instances)
+            await session.flush()
+            for instance in instances:
+                session.expunge(instance)
+    await session.commit()
+
+
+async def load_all_async(session, bulk=True, batch_size=DEFAULT_BATCH_SIZE, data_dir=None,
+                         queue_size=DEFAULT_QUEUE_SIZE):
+    """Load every source table into an AsyncSession. All files are read
+    concurrently on worker threads, each a bounded number of chunks ahead,
+    while the tables are written one at a time in dependency order."""
+    tables = [table.name for table in Base.metadata.sorted_tables if table.name in SOURCES]
+    queues = {name: asyncio.Queue(maxsize=queue_size) for name in tables}
+    producers = [asyncio.ensure_future(_produce(name, data_dir, batch_size, queues[name]))
+                 for name in tables]
+    try:
+        for name in tables:
+            await _consume(session, name, queues[name], bulk)
+        await asyncio.gather(*producers)
+    finally:
+        for producer in producers:
+            producer.cancel()
+
+
+async def build_async_session(bulk=True, batch_size=DEFAULT_BATCH_SIZE, data_dir=None,
+                              profile='api'):
+    """The asyncio counterpart of build_session(): an AsyncSession over a
+    populated in-memory database on the aiosqlite driver.
+
+    Lazy loading cannot run implicitly under asyncio, so every ORM SELECT
+    eagerly loads its relationship graph according to the named loading
+    profile (see sqlalchemy_example.loading); pass profile=None to opt out.
+    Attributes are not expired on commit for the same reason.
+
+    Release it with close_async_session(); aiosqlite runs each connection on
+    a thread that keeps the interpreter alive until the engine is disposed.
+    """
+    engine = create_async_engine('sqlite+aiosqlite://', poolclass=StaticPool)
+    event.listen(engine.sync_engine, 'connect', _enable_foreign_keys)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    session = AsyncSession(engine, expire_on_commit=False)
+    await load_all_async(session, bulk=bulk, batch_size=batch_size, data_dir=data_dir)
+    if profile is not None:
+        use_profile(session.sync_session, profile)
+    return session
+
+
+async def close_async_session(session):
+    engine = session.bind
+    await session.close()
+    await engine.dispose()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+
+from sqlalchemy_example.benchmarks import (ingest, placement, readonly, references, sharding,
+                                           statements, threads)
+from sqlalchemy_example.benchmarks.core import compare, environment, load, measure, save
+from sqlalchemy_example.benchmarks.queries import DASHBOARD, QUERIES, STREAMING
+from sqlalchemy_example.create_session import build_session
+from sqlalchemy_example.generate import write_data_dir
+from sqlalchemy_example.summaries import enable_summaries
+
+try:
+    from sqlalchemy_example.benchmarks import analytics
+except ImportError:
+    # numpy is optional
+    analytics = None
+
+
+def run_scale(data_dir, repeat=5):
+    results = {}
+    for mode, bulk in (('orm', False), ('bulk', True)):
+        for table, stats in ingest.per_table(data_dir, bulk=bulk, repeat=repeat).items():
+            results['ingest.%s.%s' % (mode, table)] = stats
+        results['build_session.%s' % mode] = ingest.build(data_dir, repeat, bulk=bulk)
+    session = build_session(bulk=True, data_dir=data_dir)
+    for name, query in QUERIES.items():
+        results['query.%s' % name] = measure(lambda: query(session), repeat,
+                                             setup=session.expunge_all)
+    for name, query in STREAMING.items():
+        results['stream.%s' % name] = measure(lambda: query(session), repeat,
+                                              setup=session.expunge_all)
+    results.update(readonly.compare_entities(session, repeat))
+    results.update(statements.compare_builders(session, repeat))
+    results.update(references.compare_rendering(session, repeat))
+    if analytics is not None:
+        results.update(analytics.compare_loops(session, repeat))
+    enable_summaries(session)
+    for name, query in DASHBOARD.items():
+        results['dashboard.%s' % name] = measure(lambda: query(session), repeat)
+    session.close()
+    results.update(threads.read_scaling(data_dir, repeat))
+    results.update(placement.writer_throughput(data_dir, repeat))
+    results.update(sharding.scatter_gather(data_dir, repeat))
+    return results
+
+
+def run(scales=(1,), repeat=5, seed=0):
+    """Run every benchmark on generated data at each scale factor and return
+    the results in the form written to and compared against baseline files."""
+    results = {'environment': environment(), 'repeat': repeat, 'seed': seed, 'results': {}}
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as directory:
+            data_dir = write_data_dir(os.path.join(directory, 'data'), scale, seed)
+            results['results'][str(scale)] = run_scale(data_dir, repeat)
+    return results
@@ -0,0 +1,42 @@
+import argparse
+import sys
+
+from sqlalchemy_example.benchmarks import compare, load, run, save
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sqlalchemy_example.benchmarks',
+                                     description='Time data loading and the canonical queries.')
+    parser.add_argument('--scale', type=float, nargs='+', default=[1],
+                        help='data scale factors to run at (default: 1)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed for the generated data (default: 0)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='repetitions per benchmark (default: 5)')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='compare against results stored in this file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown against the baseline (default: 0.25)')
+    args = parser.parse_args(argv)
+
+    results = run(args.scale, args.repeat, args.seed)
+    for scale, metrics in results['results'].items():
+        for name, stats in sorted(metrics.items()):
+            line = 'scale %-4s %-40s %10.2f ms %10.1f /s' % (scale, name, stats['median'] * 1000,
+                                                             stats['throughput'])
+            if 'peak_bytes' in stats:
+                line += ' %10.1f KiB peak' % (stats['peak_bytes'] / 1024)
+            print(line)
+    if args.output:
+        save(results, args.output)
+    if args.baseline:
+        regressions = compare(results, load(args.baseline), args.tolerance)
+        for scale, name, before, after in regressions:
+            print('REGRESSION scale %s %s: %.2f ms -> %.2f ms'
+                  % (scale, name, before * 1000, after * 1000))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
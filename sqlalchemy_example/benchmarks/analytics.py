@@ -0,0 +1,38 @@
+from collections import defaultdict
+
+from sqlalchemy_example import analytics
+from sqlalchemy_example.benchmarks.core import measure
+from sqlalchemy_example.models import Order, Stock
+
+
+def _loop_report(session):
+    # the per-object equivalent of _vector_report
+    revenue, sold, in_stock, late = (defaultdict(float), defaultdict(int), defaultdict(int),
+                                     defaultdict(int))
+    for order in session.query(Order):
+        for item in order.order_item:
+            revenue[order.store_id] += item.quantity * item.list_price * (1 - item.discount)
+            sold[order.store_id] += item.quantity
+        if order.shipped_date is not None and order.shipped_date > order.required_date:
+            late[order.store_id] += 1
+    for stock in session.query(Stock):
+        in_stock[stock.store_id] += stock.quantity or 0
+    return revenue, sold, in_stock, late
+
+
+def _vector_report(extract):
+    return (analytics.revenue(extract, 'store_id'), analytics.stock_turnover(extract),
+            analytics.shipping_lateness(extract))
+
+
+def compare_loops(session, repeat=5):
+    """Time a per-store report of revenue, stock turnover and late shipments
+    computed by iterating ORM objects, from a fresh columnar extract, and
+    from a cached one."""
+    cached = analytics.extract(session, cache=True)
+    return {
+        'analytics.orm_loop': measure(lambda: _loop_report(session), repeat,
+                                      setup=session.expunge_all),
+        'analytics.numpy': measure(lambda: _vector_report(analytics.extract(session)), repeat),
+        'analytics.numpy_cached': measure(lambda: _vector_report(cached), repeat),
+    }
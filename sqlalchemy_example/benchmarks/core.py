@@ -0,0 +1,56 @@
+import json
+import platform
+import statistics
+import time
+
+import sqlalchemy
+
+
+def measure(func, repeat=5, setup=None):
+    """Call func repeat times, running setup untimed before each call, and
+    return latency statistics in seconds."""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def summarize(timings):
+    median = statistics.median(timings)
+    return {'median': median,
+            'min': min(timings),
+            'throughput': 1 / median if median else float('inf')}
+
+
+def environment():
+    return {'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'machine': platform.machine()}
+
+
+def save(results, path):
+    with open(path, 'w') as outfile:
+        json.dump(results, outfile, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path, 'r') as infile:
+        return json.load(infile)
+
+
+def compare(results, baseline, tolerance=0.25):
+    """Return (scale, name, baseline median, current median) for every
+    benchmark whose median latency grew by more than tolerance."""
+    regressions = []
+    for scale, metrics in results['results'].items():
+        for name, current in metrics.items():
+            previous = baseline['results'].get(scale, {}).get(name)
+            if previous is None:
+                continue
+            if current['median'] > previous['median'] * (1 + tolerance):
+                regressions.append((scale, name, previous['median'], current['median']))
+    return regressions
@@ -0,0 +1,33 @@
+import time
+from collections import defaultdict
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from sqlalchemy_example.benchmarks.core import measure, summarize
+from sqlalchemy_example.create_session import build_session
+from sqlalchemy_example.load_data import SOURCES, load_table
+from sqlalchemy_example.models import Base
+
+
+def per_table(data_dir, bulk=True, repeat=3):
+    """Time load_table for every table, loading into a fresh database in
+    dependency order on each repetition."""
+    timings = defaultdict(list)
+    for _ in range(repeat):
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        session = Session(bind=engine)
+        session.execute('''PRAGMA foreign_keys = ON;''')
+        for table in Base.metadata.sorted_tables:
+            if table.name in SOURCES:
+                start = time.perf_counter()
+                load_table(session, table.name, bulk=bulk, data_dir=data_dir)
+                timings[table.name].append(time.perf_counter() - start)
+        session.close()
+        engine.dispose()
+    return {name: summarize(values) for name, values in timings.items()}
+
+
+def build(data_dir, repeat=3, **options):
+    return measure(lambda: build_session(data_dir=data_dir, **options).close(), repeat)
@@ -0,0 +1,112 @@
+import random
+import threading
+from datetime import date
+
+from sqlalchemy import select
+
+from sqlalchemy_example.benchmarks.core import measure
+from sqlalchemy_example.create_session import build_shared_database
+from sqlalchemy_example.models import Customer, Order, Order_Item, Product, Stock
+from sqlalchemy_example.placement import OrderRequest, place_orders
+
+WRITER_COUNTS = (1, 2, 4)
+
+
+def order_requests(session, count, seed=0):
+    """count OrderRequests by existing customers of one to three lines of
+    one or two units of products each store has in stock."""
+    rng = random.Random(seed)
+    customers = session.execute(select(Customer.customer_id)
+                                .order_by(Customer.customer_id)).scalars().all()
+    stocked = {}
+    for store_id, product_id in session.execute(select(Stock.store_id, Stock.product_id)
+                                                .where(Stock.quantity > 0)):
+        stocked.setdefault(store_id, []).append(product_id)
+    stores = sorted(stocked)
+    requests = []
+    for _ in range(count):
+        store_id = rng.choice(stores)
+        products = rng.sample(stocked[store_id], min(len(stocked[store_id]), rng.randint(1, 3)))
+        requests.append(OrderRequest(rng.choice(customers), store_id, 1,
+                                     [(product_id, rng.randint(1, 2)) for product_id in products]))
+    return requests
+
+
+def _place_one_by_one(session, requests):
+    # the ORM way without a write path: add objects and adjust Stock per order
+    next_id = session.execute(select(Order.order_id).order_by(Order.order_id.desc())).scalar()
+    today = date.today()
+    for request in requests:
+        stock = [session.get(Stock, (request.store_id, line[0])) for line in request.lines]
+        if any(row is None or (row.quantity or 0) < line[1]
+               for row, line in zip(stock, request.lines)):
+            continue
+        next_id += 1
+        order = Order(order_id=next_id, customer_id=request.customer_id, order_status=1,
+                      order_date=today, required_date=today,
+                      store_id=request.store_id, staff_id=request.staff_id)
+        session.add(order)
+        for item_id, (row, line) in enumerate(zip(stock, request.lines), 1):
+            row.quantity -= line[1]
+            session.add(Order_Item(order_id=next_id, item_id=item_id, product_id=line[0],
+                                   quantity=line[1],
+                                   list_price=session.get(Product, line[0]).list_price,
+                                   discount=0))
+        session.commit()
+
+
+def _write(database, batches, barrier):
+    barrier.wait()
+    for batch in batches:
+        session = database.writer()
+        try:
+            place_orders(session, batch)
+        finally:
+            session.close()
+
+
+def writer_throughput(data_dir, repeat=3, orders=400, batch_size=50,
+                      writer_counts=WRITER_COUNTS):
+    """Place orders one at a time through the ORM and in batches from a
+    growing number of writer threads sharing a WAL database, and report the
+    orders placed per second. Each run starts from a fresh database."""
+    state = {}
+
+    def setup():
+        if 'database' in state:
+            state['database'].dispose()
+        state['database'] = database = build_shared_database(data_dir=data_dir)
+        session = database.writer()
+        state['requests'] = order_requests(session, orders)
+        session.close()
+
+    def one_by_one():
+        session = state['database'].writer()
+        _place_one_by_one(session, state['requests'])
+        session.close()
+
+    results = {}
+    try:
+        stats = measure(one_by_one, repeat, setup=setup)
+        stats['throughput'] = orders / stats['median']
+        results['placement.one_by_one'] = stats
+        for count in writer_counts:
+            def run():
+                batches = [state['requests'][start:start + batch_size]
+                           for start in range(0, orders, batch_size)]
+                barrier = threading.Barrier(count)
+                threads = [threading.Thread(target=_write,
+                                            args=(state['database'], batches[index::count],
+                                                  barrier))
+                           for index in range(count)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            stats = measure(run, repeat, setup=setup)
+            stats['throughput'] = orders / stats['median']
+            results['placement.writers.%d' % count] = stats
+    finally:
+        if 'database' in state:
+            state['database'].dispose()
+    return results
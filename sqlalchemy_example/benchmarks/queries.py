@@ -0,0 +1,96 @@
+from sqlalchemy import func, select
+
+from sqlalchemy_example.iteration import keyset_pages, stream
+from sqlalchemy_example.models import *
+from sqlalchemy_example.summaries import store_day_sales
+
+
+def groupby_subquery(session):
+    city_count = session.query(Customer.city, func.count(Customer.city).label('city_count')) \
+                        .filter_by(state = 'CA') \
+                        .group_by(Customer.city) \
+                        .subquery()
+    return session.query(city_count) \
+                  .filter(city_count.c.city_count > 10) \
+                  .order_by(city_count.c.city) \
+                  .all()
+
+
+def outer_join(session):
+    return session.query(Product.product_name, Order_Item.order_id) \
+                  .outerjoin(Order_Item) \
+                  .order_by(Order_Item.order_id, Product.product_name) \
+                  .all()
+
+
+def like_search(session):
+    return session.query(Product.product_id, Product.product_name, Product.list_price) \
+                  .filter(Product.product_name.like('%Cruiser%')) \
+                  .order_by(Product.list_price.desc(), Product.product_id) \
+                  .all()
+
+
+def in_filter(session):
+    return session.query(Product.product_name, Product.list_price) \
+                  .filter(Product.list_price.in_([89.99, 109.99, 159.99])) \
+                  .order_by(Product.list_price) \
+                  .all()
+
+
+def relationship_traversal(session):
+    return [(category.category_name, len(category.products))
+            for category in session.query(Category).all()]
+
+
+QUERIES = {
+    'groupby_subquery': groupby_subquery,
+    'outer_join': outer_join,
+    'like_search': like_search,
+    'in_filter': in_filter,
+    'relationship_traversal': relationship_traversal,
+}
+
+
+def outer_join_first_chunk(session):
+    query = session.query(Product.product_name, Order_Item.order_id) \
+                   .outerjoin(Order_Item) \
+                   .order_by(Order_Item.order_id, Product.product_name)
+    return next(stream(session, query, 1000))
+
+
+def order_item_keyset(session):
+    return sum(len(page) for page in keyset_pages(session, Order_Item, page_size=1000))
+
+
+def order_item_stream(session):
+    return sum(len(chunk) for chunk in stream(session, select(Order_Item), 1000))
+
+
+STREAMING = {
+    'outer_join_first_chunk': outer_join_first_chunk,
+    'order_item_keyset': order_item_keyset,
+    'order_item_stream': order_item_stream,
+}
+
+
+def store_month_revenue(session):
+    month = func.strftime('%Y-%m', Order.order_date)
+    revenue = Order_Item.quantity * Order_Item.list_price * (1 - Order_Item.discount)
+    return session.query(Order.store_id, month, func.sum(revenue)) \
+                  .join(Order_Item) \
+                  .group_by(Order.store_id, month) \
+                  .all()
+
+
+def store_month_revenue_summary(session):
+    month = func.strftime('%Y-%m', store_day_sales.c.order_date)
+    return session.query(store_day_sales.c.store_id, month, func.sum(store_day_sales.c.revenue)) \
+                  .group_by(store_day_sales.c.store_id, month) \
+                  .all()
+
+
+# run against a session with enable_summaries() applied
+DASHBOARD = {
+    'store_month_revenue': store_month_revenue,
+    'store_month_revenue_summary': store_month_revenue_summary,
+}
@@ -0,0 +1,33 @@
+import tracemalloc
+
+from sqlalchemy_example.benchmarks.core import measure
+from sqlalchemy_example.models import Customer, Order, Order_Item
+from sqlalchemy_example.readonly import fetch_rows
+
+MODELS = (Customer, Order, Order_Item)
+
+
+def _peak_bytes(func):
+    tracemalloc.start()
+    try:
+        result = func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        del result
+
+
+def compare_entities(session, repeat=5):
+    """Time and measure peak memory of loading every row of each model as
+    full ORM entities and as read-only rows."""
+    results = {}
+    for model in MODELS:
+        name = model.__table__.name
+        for mode, func in (('entities', lambda: session.query(model).all()),
+                           ('rows', lambda: fetch_rows(session, model))):
+            stats = measure(func, repeat, setup=session.expunge_all)
+            session.expunge_all()
+            stats['peak_bytes'] = _peak_bytes(func)
+            session.expunge_all()
+            results['readonly.%s.%s' % (mode, name)] = stats
+    return results
@@ -0,0 +1,45 @@
+from sqlalchemy import select
+
+from sqlalchemy_example.benchmarks.core import measure
+from sqlalchemy_example.models import Brand, Category, Order, Staff, Store
+from sqlalchemy_example.references import ReferenceCache
+
+ORDERS = 50
+
+
+def _orders(session):
+    return session.execute(select(Order).order_by(Order.order_id).limit(ORDERS)).scalars().all()
+
+
+def _render_orm(session):
+    # lines of (store, staff, brand, category) names through relationships
+    return [(order.store.store_name, order.staff.last_name, item.product.brand.brand_name,
+             item.product.category.category_name)
+            for order in _orders(session) for item in order.order_item]
+
+
+def _render_cached(session, cache):
+    lines = []
+    for order in _orders(session):
+        store = cache.get(session, Store, order.store_id)
+        staff = cache.get(session, Staff, order.staff_id)
+        for item in order.order_item:
+            product = item.product
+            lines.append((store.store_name, staff.last_name,
+                          cache.get(session, Brand, product.brand_id).brand_name,
+                          cache.get(session, Category, product.category_id).category_name))
+    return lines
+
+
+def compare_rendering(session, repeat=5):
+    """Time rendering a page of orders with their store, staff, brand and
+    category names through relationship loads and through a warm
+    ReferenceCache, starting each page from an empty session."""
+    cache = ReferenceCache()
+    _render_cached(session, cache)
+    return {
+        'references.orm': measure(lambda: _render_orm(session), repeat,
+                                  setup=session.expunge_all),
+        'references.cached': measure(lambda: _render_cached(session, cache), repeat,
+                                     setup=session.expunge_all),
+    }
@@ -0,0 +1,30 @@
+from sqlalchemy_example.benchmarks.core import measure
+from sqlalchemy_example.create_session import build_shared_database
+from sqlalchemy_example.sharding import ShardSet, build_shards, revenue_by_month, units_by_product
+
+REPORTS = (revenue_by_month, units_by_product)
+
+
+def _report(shards):
+    return [report(shards) for report in REPORTS]
+
+
+def scatter_gather(data_dir, repeat=5):
+    """Time the sharded reports against one unsharded file, on the shards
+    one after another in this process, and across a process pool."""
+    database = build_shared_database(data_dir=data_dir)
+    unsharded = ShardSet({0: database.path}, workers=0)
+    serial = build_shards(data_dir=data_dir, workers=0)
+    parallel = ShardSet(serial.paths)
+    try:
+        _report(parallel)
+        return {
+            'sharding.unsharded': measure(lambda: _report(unsharded), repeat),
+            'sharding.serial': measure(lambda: _report(serial), repeat),
+            'sharding.parallel': measure(lambda: _report(parallel), repeat),
+        }
+    finally:
+        parallel.dispose()
+        serial.dispose()
+        unsharded.dispose()
+        database.dispose()
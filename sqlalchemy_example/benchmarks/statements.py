@@ -0,0 +1,40 @@
+from sqlalchemy import func
+
+from sqlalchemy_example.benchmarks.core import measure
+from sqlalchemy_example.models import Customer, Product
+from sqlalchemy_example.statements import execute
+
+# narrow lookups, so that building and compiling the statement rather than
+# fetching rows dominates each call
+PARAMETERS = [dict(state=state, category_id=category_id, model_year=model_year)
+              for state in ('CA', 'NY', 'TX')
+              for category_id, model_year in ((1, 2016), (3, 2017), (6, 2019))]
+
+
+def _legacy(session, state, category_id, model_year):
+    session.query(Customer.city, func.count(Customer.city)) \
+           .filter_by(state = state) \
+           .group_by(Customer.city) \
+           .order_by(Customer.city) \
+           .all()
+    session.query(Product).filter_by(category_id = category_id, model_year = model_year) \
+           .order_by(Product.product_id) \
+           .all()
+
+
+def _registry(session, state, category_id, model_year):
+    execute(session, 'city_counts', state=state).all()
+    execute(session, 'products_by_category_and_year', category_id=category_id,
+            model_year=model_year).scalars().all()
+
+
+def compare_builders(session, repeat=5, rounds=20):
+    """Time rounds of the hot query shapes built with the legacy Query API
+    on every call against the same shapes executed from the registry."""
+    results = {}
+    for mode, func in (('legacy', _legacy), ('registry', _registry)):
+        func(session, **PARAMETERS[0])
+        results['statements.%s' % mode] = measure(
+            lambda: [func(session, **parameters) for _ in range(rounds)
+                     for parameters in PARAMETERS], repeat, setup=session.expunge_all)
+    return results
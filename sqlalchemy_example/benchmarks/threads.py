@@ -0,0 +1,42 @@
+import threading
+
+from sqlalchemy_example.benchmarks.core import measure
+from sqlalchemy_example.benchmarks.queries import QUERIES
+from sqlalchemy_example.create_session import build_shared_database
+
+THREAD_COUNTS = (1, 2, 4, 8)
+
+
+def _read(database, iterations, barrier):
+    session = database.readers()
+    barrier.wait()
+    try:
+        for _ in range(iterations):
+            for query in QUERIES.values():
+                query(session)
+                session.expunge_all()
+    finally:
+        database.readers.remove()
+
+
+def read_scaling(data_dir, repeat=3, iterations=5, thread_counts=THREAD_COUNTS):
+    """Run the canonical query mix from a growing number of threads against a
+    shared WAL database and report the aggregate query throughput."""
+    database = build_shared_database(data_dir=data_dir, pool_size=max(thread_counts))
+    results = {}
+    try:
+        for count in thread_counts:
+            def run():
+                barrier = threading.Barrier(count)
+                threads = [threading.Thread(target=_read, args=(database, iterations, barrier))
+                           for _ in range(count)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            stats = measure(run, repeat)
+            stats['throughput'] = count * iterations * len(QUERIES) / stats['median']
+            results['threads.read.%d' % count] = stats
+    finally:
+        database.dispose()
+    return results
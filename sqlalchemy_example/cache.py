@@ -0,0 +1,101 @@
+import glob
+import hashlib
+import os
+import sqlite3
+import tempfile
+from urllib.parse import quote
+
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from sqlalchemy_example import load_data
+from sqlalchemy_example.models import Base
+
+CACHE_PREFIX = 'sqlalchemy_example-'
+
+
+def dataset_hash(data_dir=None):
+    """Return a digest of everything that determines the loaded database:
+    the CSV files, including the reference tables, the loader module and the
+    DDL emitted for Base.metadata."""
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(data_dir or load_data.DATA_DIR, '*.csv'))):
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as datafile:
+            for block in iter(lambda: datafile.read(1 << 16), b''):
+                digest.update(block)
+    with open(load_data.__file__, 'rb') as source:
+        digest.update(source.read())
+    dialect = sqlite.dialect()
+    for table in Base.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    return digest.hexdigest()
+
+
+def _source_prefix(data_dir=None):
+    # cache files are named after the data directory they were built from as
+    # well as its contents, so caches of different datasets can share a
+    # cache_dir without pruning each other
+    source = os.path.abspath(data_dir or load_data.DATA_DIR)
+    return '%s%s-' % (CACHE_PREFIX, hashlib.sha256(source.encode()).hexdigest()[:16])
+
+
+def cache_path(cache_dir, data_dir=None):
+    return os.path.join(cache_dir, '%s%s.sqlite' % (_source_prefix(data_dir),
+                                                    dataset_hash(data_dir)[:32]))
+
+
+def _write_cache(connection, path, data_dir=None):
+    # write to a temporary file and rename it into place so that concurrent
+    # readers never observe a half-written cache
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(handle)
+    try:
+        target = sqlite3.connect(temp_path)
+        try:
+            connection.backup(target)
+        finally:
+            target.close()
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    pattern = os.path.join(os.path.dirname(path), _source_prefix(data_dir) + '*.sqlite')
+    for stale in glob.glob(pattern):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                # another process pruned it first
+                pass
+
+
+def cached_connection(cache_dir, build, in_memory=True, data_dir=None):
+    """Return a DBAPI connection to the cached database for the current data,
+    calling build() to produce a populated connection when no valid cache
+    file exists.
+
+    With in_memory the file is copied into a private in-memory database;
+    otherwise the file itself is opened read-only so the cache can never be
+    modified through the returned connection.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(cache_dir, data_dir)
+    if not os.path.exists(path):
+        built = build()
+        _write_cache(built, path, data_dir)
+        if in_memory:
+            return built
+        built.close()
+    if not in_memory:
+        return sqlite3.connect('file:%s?mode=ro' % quote(os.path.abspath(path)),
+                               uri=True, check_same_thread=False)
+    source = sqlite3.connect(path)
+    connection = sqlite3.connect(':memory:', check_same_thread=False)
+    try:
+        source.backup(connection)
+    finally:
+        source.close()
+    return connection
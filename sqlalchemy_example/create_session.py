@@ -1,22 +1,156 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import os
+import sqlite3
+import tempfile
+import threading
 
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from sqlalchemy_example.cache import cached_connection
 from sqlalchemy_example.models import Base
 from sqlalchemy_example.load_data import *
 
-def build_session():
-    engine = create_engine('sqlite:///:memory:', echo=False)
+# one template per (data_dir, cache_dir), since each holds a different dataset
+_templates = {}
+_template_lock = threading.Lock()
+
+
+def _engine_for(connection):
+    # every checkout hands back the same DBAPI connection, so all sessions
+    # bound to the engine see the one in-memory database it holds
+    return create_engine('sqlite://', creator=lambda: connection,
+                         poolclass=StaticPool, echo=False)
+
+
+def _populate(engine, bulk=False, batch_size=DEFAULT_BATCH_SIZE, workers=None, data_dir=None):
     Base.metadata.create_all(engine)
     Session = sessionmaker(bind=engine)
     session = Session()
     session.execute('''PRAGMA foreign_keys = ON;''')
-    load_categories(session)
-    load_brands(session)
-    load_products(session)
-    load_customers(session)
-    load_stores(session)
-    load_stocks(session)
-    load_staff(session)
-    load_orders(session)
-    load_order_items(session)
+    if workers is None:
+        load_all(session, bulk=bulk, batch_size=batch_size, data_dir=data_dir)
+    else:
+        load_all_parallel(session, bulk=bulk, batch_size=batch_size, data_dir=data_dir,
+                          workers=workers)
     return session
+
+
+def _build_connection(load_options):
+    connection = sqlite3.connect(':memory:', check_same_thread=False)
+    _populate(_engine_for(connection), **load_options).close()
+    return connection
+
+
+def _fresh_connection(load_options, cache_dir, in_memory=True):
+    if cache_dir is None:
+        return _build_connection(load_options)
+    return cached_connection(cache_dir, lambda: _build_connection(load_options), in_memory,
+                             load_options['data_dir'])
+
+
+def _template_connection(load_options, cache_dir):
+    key = tuple(path and os.path.abspath(path) for path in (load_options['data_dir'], cache_dir))
+    with _template_lock:
+        if key not in _templates:
+            _templates[key] = _fresh_connection(load_options, cache_dir)
+        return _templates[key]
+
+
+def clone_template(bulk=True, batch_size=DEFAULT_BATCH_SIZE, workers=None, data_dir=None,
+                   cache_dir=None):
+    """Return a new DBAPI connection holding a private copy of the template
+    database for data_dir, populating the template (from cache_dir if given)
+    on first use."""
+    load_options = dict(bulk=bulk, batch_size=batch_size, workers=workers, data_dir=data_dir)
+    template = _template_connection(load_options, cache_dir)
+    connection = sqlite3.connect(':memory:', check_same_thread=False)
+    with _template_lock:
+        template.backup(connection)
+    return connection
+
+
+def build_session(bulk=False, batch_size=DEFAULT_BATCH_SIZE, workers=None, data_dir=None,
+                  template=False, cache_dir=None, in_memory=True):
+    load_options = dict(bulk=bulk, batch_size=batch_size, workers=workers, data_dir=data_dir)
+    if template:
+        connection = clone_template(cache_dir=cache_dir, **load_options)
+    elif cache_dir is not None:
+        connection = _fresh_connection(load_options, cache_dir, in_memory)
+    else:
+        engine = create_engine('sqlite:///:memory:', echo=False)
+        return _populate(engine, **load_options)
+    Session = sessionmaker(bind=_engine_for(connection))
+    session = Session()
+    session.execute('''PRAGMA foreign_keys = ON;''')
+    return session
+
+
+class SharedDatabase(object):
+    """A populated file-backed SQLite database in WAL mode, shared by one
+    writer and many concurrent readers.
+
+    ``readers`` is a scoped_session giving each thread its own read-only
+    session from a pool of reader connections; call ``readers.remove()``
+    when a thread is done. ``writer()`` returns a session on the single
+    writer connection, so writers queue for it rather than failing with
+    "database is locked". In WAL mode readers see the last committed state
+    and are never blocked by the writer.
+    """
+
+    def __init__(self, path, pool_size=8, timeout=30, owns_file=False):
+        self.path = path
+        self._owns_file = owns_file
+        url = 'sqlite:///%s' % path
+        connect_args = {'check_same_thread': False, 'timeout': timeout}
+        self.reader_engine = create_engine(url, poolclass=QueuePool, pool_size=pool_size,
+                                           max_overflow=0, pool_timeout=timeout,
+                                           connect_args=connect_args)
+        self.writer_engine = create_engine(url, poolclass=QueuePool, pool_size=1,
+                                           max_overflow=0, pool_timeout=timeout,
+                                           connect_args=connect_args)
+        event.listen(self.reader_engine, 'connect', self._connect_reader)
+        event.listen(self.writer_engine, 'connect', self._connect_writer)
+        self.readers = scoped_session(sessionmaker(bind=self.reader_engine))
+        self.writer = sessionmaker(bind=self.writer_engine)
+
+    @staticmethod
+    def _connect_reader(dbapi_connection, connection_record):
+        dbapi_connection.execute('''PRAGMA query_only = ON;''')
+
+    @staticmethod
+    def _connect_writer(dbapi_connection, connection_record):
+        dbapi_connection.execute('''PRAGMA foreign_keys = ON;''')
+
+    def dispose(self):
+        self.readers.remove()
+        self.reader_engine.dispose()
+        self.writer_engine.dispose()
+        if self._owns_file:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
+
+
+def build_shared_database(path=None, pool_size=8, bulk=True, batch_size=DEFAULT_BATCH_SIZE,
+                          workers=None, data_dir=None, template=False, cache_dir=None):
+    """Write the populated database to path (a temporary file, removed by
+    dispose(), if not given), switch it to WAL mode and return a
+    SharedDatabase over it."""
+    load_options = dict(bulk=bulk, batch_size=batch_size, workers=workers, data_dir=data_dir)
+    if template:
+        source = clone_template(cache_dir=cache_dir, **load_options)
+    else:
+        source = _fresh_connection(load_options, cache_dir)
+    owns_file = path is None
+    if owns_file:
+        handle, path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(handle)
+    target = sqlite3.connect(path)
+    try:
+        source.backup(target)
+        target.execute('''PRAGMA journal_mode = WAL;''')
+    finally:
+        target.close()
+        source.close()
+    return SharedDatabase(path, pool_size, owns_file=owns_file)
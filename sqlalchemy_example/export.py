@@ -0,0 +1,225 @@
+import argparse
+import os
+import sys
+from itertools import chain
+
+from sqlalchemy import Boolean, Date, Float, Integer, String, create_engine, func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.selectable import Join
+
+from sqlalchemy_example.iteration import stream
+from sqlalchemy_example.load_data import SOURCES, format_value, model_for, write_rows
+from sqlalchemy_example.models import Order, Order_Item, Product
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    # pyarrow is optional; only the Arrow and Parquet writers need it
+    pyarrow = None
+
+# rows fetched per chunk, which is also the row group / record batch size
+# of Parquet and Arrow files
+DEFAULT_CHUNK_SIZE = 10000
+
+FORMATS = ('csv', 'parquet', 'arrow')
+EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def table_statement(table_name):
+    """A select() of a source table's columns in SOURCES order, ordered by
+    primary key, so a CSV export reloads with the same ids."""
+    table = model_for(table_name).__table__
+    return select(*[table.c[name] for name in SOURCES[table_name][1]]) \
+        .order_by(*table.primary_key.columns)
+
+
+def order_lines():
+    """A select() of every order item with its order and product details."""
+    revenue = Order_Item.quantity * Order_Item.list_price * (1 - Order_Item.discount)
+    return select(Order.order_id, Order_Item.item_id, Order.order_date, Order.store_id,
+                  Order.staff_id, Order.customer_id, Product.product_id, Product.product_name,
+                  Product.brand_id, Product.category_id, Order_Item.quantity,
+                  Order_Item.list_price, Order_Item.discount, revenue.label('revenue')) \
+        .join(Order_Item, Order_Item.order_id == Order.order_id) \
+        .join(Product, Product.product_id == Order_Item.product_id) \
+        .order_by(Order.order_id, Order_Item.item_id)
+
+
+def _rows(session, statement, chunk_size):
+    return chain.from_iterable(stream(session, statement, chunk_size))
+
+
+def check_reloadable(session, table_name):
+    """Raise ValueError if a CSV export of table_name would not reload with
+    the same ids: source files leave out ids the database assigns (see
+    SOURCES), which reloading only reproduces if they run from 1 to N."""
+    table = model_for(table_name).__table__
+    names = SOURCES[table_name][1]
+    for column in table.primary_key.columns:
+        if column.name in names:
+            continue
+        count, first, last = session.execute(select(func.count(), func.min(column),
+                                                    func.max(column))).one()
+        if count and (first, last) != (1, count):
+            raise ValueError('%s ids are not 1..%d, so a CSV export would not reload with '
+                             'the same ids; export to parquet or arrow instead'
+                             % (table_name, count))
+
+
+def export_table_csv(session, table_name, path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write a source table to path in the format load_table() reads."""
+    check_reloadable(session, table_name)
+    write_rows(table_name, _rows(session, table_statement(table_name), chunk_size), path)
+
+
+def export_csv(session, statement, path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write the rows of any select() to path as header-less CSV with the
+    same value formatting as the source files."""
+    with open(path, 'w', newline='') as datafile:
+        for chunk in stream(session, statement, chunk_size):
+            datafile.writelines(','.join(format_value(value) for value in row) + '\n'
+                                for row in chunk)
+
+
+def _require_pyarrow():
+    if pyarrow is None:
+        raise ImportError('Arrow and Parquet export need pyarrow')
+
+
+def _arrow_type(sql_type):
+    # None for types with no fixed Arrow equivalent, such as the NullType of
+    # an untyped func.strftime()
+    if isinstance(sql_type, Boolean):
+        return pyarrow.bool_()
+    if isinstance(sql_type, Integer):
+        return pyarrow.int64()
+    if isinstance(sql_type, Float):
+        return pyarrow.float64()
+    if isinstance(sql_type, Date):
+        return pyarrow.date32()
+    if isinstance(sql_type, String):
+        return pyarrow.string()
+    return None
+
+
+def _required_tables(from_clause, optional=False):
+    # the tables a row always has a row of: those not on the outer side of
+    # an outer join, at any depth
+    if isinstance(from_clause, Join):
+        return _required_tables(from_clause.left, optional or from_clause.full) \
+            + _required_tables(from_clause.right, optional or from_clause.isouter)
+    return [] if optional else [from_clause]
+
+
+def arrow_schema(statement, sample=None):
+    """The Arrow schema of statement's rows, derived from the Column
+    definitions where possible.
+
+    A field is only non-nullable if it selects a non-nullable column of a
+    table every row joins to. Expressions of a type with no Arrow
+    equivalent take the type pyarrow infers from the sample rows, or
+    string. Unlabeled expressions are named after their column, or
+    col_<position>."""
+    _require_pyarrow()
+    required = [table for from_clause in statement.get_final_froms()
+                for table in _required_tables(from_clause)]
+    fields = []
+    for position, column in enumerate(statement.selected_columns):
+        name = column.key or getattr(column, 'name', None) or 'col_%d' % position
+        table = getattr(column, 'table', None)
+        nullable = getattr(column, 'nullable', True) \
+            or not any(table is required_table for required_table in required)
+        arrow_type = _arrow_type(column.type)
+        if arrow_type is None and sample:
+            arrow_type = pyarrow.array([row[position] for row in sample]).type
+        if arrow_type is None or pyarrow.types.is_null(arrow_type):
+            arrow_type = pyarrow.string()
+        fields.append(pyarrow.field(name, arrow_type, nullable=nullable))
+    return pyarrow.schema(fields)
+
+
+def _write(session, statement, chunk_size, open_writer):
+    # the schema is taken from the first chunk, so the writer is opened then
+    writer = schema = None
+    try:
+        for chunk in stream(session, statement, chunk_size):
+            if writer is None:
+                schema = arrow_schema(statement, chunk)
+                writer = open_writer(schema)
+            columns = list(zip(*chunk))
+            writer.write_batch(pyarrow.record_batch(
+                [pyarrow.array(column, type=field.type)
+                 for column, field in zip(columns, schema)], schema=schema))
+        if writer is None:
+            writer = open_writer(arrow_schema(statement))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_parquet(session, statement, path, chunk_size=DEFAULT_CHUNK_SIZE,
+                   compression='snappy'):
+    """Write the rows of statement to a Parquet file, one row group per
+    chunk, holding at most one chunk in memory."""
+    _require_pyarrow()
+    _write(session, statement, chunk_size,
+           lambda schema: pyarrow.parquet.ParquetWriter(path, schema, compression=compression))
+
+
+def export_arrow(session, statement, path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write the rows of statement to an Arrow IPC file, one record batch
+    per chunk."""
+    _require_pyarrow()
+    _write(session, statement, chunk_size, lambda schema: pyarrow.ipc.new_file(path, schema))
+
+
+def export_all(session, directory, format='csv', chunk_size=DEFAULT_CHUNK_SIZE):
+    """Export every source table to directory. CSV files take their SOURCES
+    names, so the directory can be loaded again as a data_dir."""
+    if format not in FORMATS:
+        raise ValueError('unknown export format %r' % format)
+    if format == 'csv':
+        # before anything is written, so a refused export leaves no files
+        for table_name in SOURCES:
+            check_reloadable(session, table_name)
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for table_name, (filename, _) in SOURCES.items():
+        if format == 'csv':
+            paths[table_name] = os.path.join(directory, filename)
+            export_table_csv(session, table_name, paths[table_name], chunk_size)
+            continue
+        paths[table_name] = os.path.join(directory, table_name + EXTENSIONS[format])
+        # columnar files keep every column, including generated ids
+        statement = select(model_for(table_name).__table__) \
+            .order_by(*model_for(table_name).__table__.primary_key.columns)
+        if format == 'parquet':
+            export_parquet(session, statement, paths[table_name], chunk_size)
+        else:
+            export_arrow(session, statement, paths[table_name], chunk_size)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sqlalchemy_example.export',
+                                     description='Export the tables of a SQLite database file.')
+    parser.add_argument('database')
+    parser.add_argument('directory')
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    engine = create_engine('sqlite:///' + args.database)
+    session = Session(bind=engine)
+    try:
+        for table_name, path in sorted(export_all(session, args.directory, args.format,
+                                                  args.chunk_size).items()):
+            print('%-12s %s' % (table_name, path))
+        return 0
+    finally:
+        session.close()
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
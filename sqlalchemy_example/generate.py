@@ -0,0 +1,185 @@
+import os
+import random
+import shutil
+from bisect import bisect
+from collections import Counter
+from datetime import timedelta
+from functools import lru_cache
+from itertools import accumulate, groupby
+
+from sqlalchemy_example.load_data import (DATA_DIR, DEFAULT_BATCH_SIZE, SOURCES, batches,
+                                          insert_batches, load_table, read_rows, source_path,
+                                          write_rows)
+from sqlalchemy_example.models import Base
+
+# tables synthesised at the requested scale; the remaining tables are
+# reference data copied from the sample
+GENERATED = ('customer', 'order', 'order_item', 'stock')
+
+
+class _Sample(object):
+    # distributions observed in the bundled sample data
+
+    def __init__(self):
+        customers = list(read_rows('customer'))
+        orders = list(read_rows('order'))
+        items = list(read_rows('order_item'))
+        products = list(read_rows('product'))
+        stocks = list(read_rows('stock'))
+        stores = [row['store_id'] for row in read_rows('store')]
+
+        self.customers = len(customers)
+        self.orders = len(orders)
+        self.first_names = sorted({row['first_name'] for row in customers})
+        self.last_names = sorted({row['last_name'] for row in customers})
+        self.domains = sorted({row['email'].split('@')[1] for row in customers})
+        self.streets = sorted({row['street'].split(' ', 1)[1].strip()
+                               for row in customers if row['street']})
+        self.places = sorted({(row['city'], row['state'], row['zip_code']) for row in customers})
+        self.phone_rate = sum(row['phone'] is not None for row in customers) / len(customers)
+
+        self.order_dates = [row['order_date'] for row in orders]
+        # status, lead time to required date and days to ship (None when the
+        # order has not shipped) are drawn together to keep them consistent
+        self.fulfilment = [(row['order_status'],
+                            (row['required_date'] - row['order_date']).days,
+                            None if row['shipped_date'] is None
+                            else (row['shipped_date'] - row['order_date']).days)
+                           for row in orders]
+        self.sellers = [(row['store_id'], row['staff_id']) for row in orders]
+
+        self.basket_sizes = [len(list(group))
+                             for _, group in groupby(items, key=lambda row: row['order_id'])]
+        self.quantities = [row['quantity'] for row in items]
+        self.discounts = [row['discount'] for row in items]
+        self.prices = {row['product_id']: row['list_price'] for row in products}
+        # popularity follows the sample's sales, smoothed so that every product
+        # can sell; the sample itself is heavily skewed towards a few models
+        sales = Counter(row['product_id'] for row in items)
+        self.products = sorted(self.prices)
+        self.popularity = list(accumulate(sales[product] + 1 for product in self.products))
+
+        self.stores = stores
+        self.stock_density = len(stocks) / (len(stores) * len(self.products))
+        self.stock_levels = [row['quantity'] for row in stocks]
+
+
+@lru_cache(maxsize=1)
+def _sample():
+    return _Sample()
+
+
+def _rng(seed, table):
+    return random.Random('%s:%s' % (seed, table))
+
+
+def row_counts(scale):
+    sample = _sample()
+    return {'customer': max(1, round(sample.customers * scale)),
+            'order': max(1, round(sample.orders * scale))}
+
+
+def _customers(scale, seed):
+    sample, rng = _sample(), _rng(seed, 'customer')
+    for _ in range(row_counts(scale)['customer']):
+        first_name = rng.choice(sample.first_names)
+        last_name = rng.choice(sample.last_names)
+        city, state, zip_code = rng.choice(sample.places)
+        phone = None
+        if rng.random() < sample.phone_rate:
+            phone = '(%03d) %03d-%04d' % (rng.randint(200, 999), rng.randint(200, 999),
+                                         rng.randint(0, 9999))
+        yield dict(first_name=first_name,
+                   last_name=last_name,
+                   phone=phone,
+                   email='%s.%s@%s' % (first_name.lower(), last_name.lower(),
+                                       rng.choice(sample.domains)),
+                   street='%d %s' % (rng.randint(1, 9999), rng.choice(sample.streets)),
+                   city=city,
+                   state=state,
+                   zip_code=zip_code)
+
+
+def _orders(scale, seed):
+    sample, rng = _sample(), _rng(seed, 'order')
+    counts = row_counts(scale)
+    for order_id in range(1, counts['order'] + 1):
+        order_date = rng.choice(sample.order_dates)
+        order_status, lead_time, ship_time = rng.choice(sample.fulfilment)
+        store_id, staff_id = rng.choice(sample.sellers)
+        yield dict(order_id=order_id,
+                   customer_id=rng.randint(1, counts['customer']),
+                   order_status=order_status,
+                   order_date=order_date,
+                   required_date=order_date + timedelta(days=lead_time),
+                   shipped_date=None if ship_time is None
+                                else order_date + timedelta(days=ship_time),
+                   store_id=store_id,
+                   staff_id=staff_id)
+
+
+def _order_items(scale, seed):
+    sample, rng = _sample(), _rng(seed, 'order_item')
+    total = sample.popularity[-1]
+    for order_id in range(1, row_counts(scale)['order'] + 1):
+        products = set()
+        for item_id in range(1, rng.choice(sample.basket_sizes) + 1):
+            product_id = sample.products[bisect(sample.popularity, rng.random() * total)]
+            while product_id in products:
+                product_id = sample.products[bisect(sample.popularity, rng.random() * total)]
+            products.add(product_id)
+            yield dict(order_id=order_id,
+                       item_id=item_id,
+                       product_id=product_id,
+                       quantity=rng.choice(sample.quantities),
+                       list_price=sample.prices[product_id],
+                       discount=rng.choice(sample.discounts))
+
+
+def _stocks(scale, seed):
+    # one row per (store, product) at most, so only the quantities scale
+    sample, rng = _sample(), _rng(seed, 'stock')
+    for store_id in sample.stores:
+        for product_id in sample.products:
+            if rng.random() < sample.stock_density:
+                yield dict(store_id=store_id,
+                           product_id=product_id,
+                           quantity=round(rng.choice(sample.stock_levels) * scale))
+
+
+_GENERATORS = {
+    'customer': _customers,
+    'order': _orders,
+    'order_item': _order_items,
+    'stock': _stocks,
+}
+
+
+def generate_rows(table_name, scale=1, seed=0):
+    """Yield rows for table_name in the form read_rows produces. Output
+    depends only on (table_name, scale, seed), and every foreign key refers
+    to a row produced by the same scale and seed or to the reference data."""
+    return _GENERATORS[table_name](scale, seed)
+
+
+def write_data_dir(directory, scale=1, seed=0):
+    """Write a complete data directory loadable with build_session(data_dir=...)."""
+    os.makedirs(directory, exist_ok=True)
+    for table_name, (filename, _) in SOURCES.items():
+        target = os.path.join(directory, filename)
+        if table_name in GENERATED:
+            write_rows(table_name, generate_rows(table_name, scale, seed), target)
+        else:
+            shutil.copyfile(source_path(table_name, DATA_DIR), target)
+    return directory
+
+
+def load_generated(session, scale=1, seed=0, bulk=True, batch_size=DEFAULT_BATCH_SIZE):
+    """Load the reference tables from the sample and stream generated rows for
+    the remaining tables straight into session, without writing any CSVs."""
+    for table in Base.metadata.sorted_tables:
+        if table.name in GENERATED:
+            chunks = batches(generate_rows(table.name, scale, seed), batch_size)
+            insert_batches(session, table.name, chunks, bulk)
+        elif table.name in SOURCES:
+            load_table(session, table.name, bulk, batch_size)
@@ -0,0 +1,146 @@
+from sqlalchemy import Column, Integer, Table, func, literal, select, text
+
+from sqlalchemy_example.models import Order, Order_Item, Staff, feature_metadata
+
+# one row per (ancestor, descendant) pair in the reporting hierarchy,
+# including every staff member paired with itself at depth 0
+staff_closure = Table('staff_closure', feature_metadata,
+                      Column('ancestor_id', Integer, primary_key=True),
+                      Column('descendant_id', Integer, primary_key=True, index=True),
+                      Column('depth', Integer, nullable=False))
+
+# bounds the recursive queries should manager_id ever form a cycle
+MAX_DEPTH = 100
+
+_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS staff_closure_insert AFTER INSERT ON staff BEGIN
+         INSERT INTO staff_closure (ancestor_id, descendant_id, depth)
+         VALUES (new.staff_id, new.staff_id, 0);
+         INSERT INTO staff_closure (ancestor_id, descendant_id, depth)
+         SELECT ancestor_id, new.staff_id, depth + 1 FROM staff_closure
+         WHERE descendant_id = new.manager_id;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS staff_closure_cycle
+       BEFORE UPDATE OF manager_id ON staff
+       WHEN EXISTS (SELECT 1 FROM staff_closure
+                    WHERE ancestor_id = new.staff_id AND descendant_id = new.manager_id) BEGIN
+         SELECT RAISE(ABORT, 'staff cannot report to themselves or their own reports');
+       END''',
+    # moving a staff member moves their whole subtree: every link from an
+    # ancestor outside the subtree into it is replaced by one through the
+    # new manager
+    '''CREATE TRIGGER IF NOT EXISTS staff_closure_move AFTER UPDATE OF manager_id ON staff
+       WHEN old.manager_id IS NOT new.manager_id BEGIN
+         DELETE FROM staff_closure
+         WHERE descendant_id IN (SELECT descendant_id FROM staff_closure
+                                 WHERE ancestor_id = new.staff_id)
+           AND ancestor_id NOT IN (SELECT descendant_id FROM staff_closure
+                                   WHERE ancestor_id = new.staff_id);
+         INSERT INTO staff_closure (ancestor_id, descendant_id, depth)
+         SELECT above.ancestor_id, below.descendant_id, above.depth + below.depth + 1
+         FROM staff_closure AS above, staff_closure AS below
+         WHERE above.descendant_id = new.manager_id AND below.ancestor_id = new.staff_id;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS staff_closure_delete AFTER DELETE ON staff BEGIN
+         DELETE FROM staff_closure
+         WHERE ancestor_id = old.staff_id OR descendant_id = old.staff_id;
+       END''',
+]
+
+
+def enable_closure(session):
+    """Create the staff_closure table and the triggers that keep it in step
+    with staff.manager_id, populate it and commit. The triggers also refuse
+    a manager change that would make the hierarchy cyclic."""
+    feature_metadata.create_all(session.connection(), tables=[staff_closure])
+    for statement in _TRIGGERS:
+        session.execute(text(statement))
+    rebuild_closure(session)
+    session.commit()
+    return session
+
+
+def rebuild_closure(session):
+    tree = select(Staff.staff_id.label('ancestor_id'), Staff.staff_id.label('descendant_id'),
+                  literal(0).label('depth')) \
+        .cte('closure', recursive=True)
+    tree = tree.union_all(select(tree.c.ancestor_id, Staff.staff_id, tree.c.depth + 1)
+                          .where(Staff.manager_id == tree.c.descendant_id)
+                          .where(tree.c.depth < MAX_DEPTH))
+    session.execute(staff_closure.delete())
+    session.execute(staff_closure.insert().from_select(['ancestor_id', 'descendant_id', 'depth'],
+                                                       select(tree)))
+
+
+def subtree(staff_id, closure=False):
+    """A selectable of (staff_id, depth) for staff_id and everyone who
+    reports to them, directly or not, with depth counted from staff_id."""
+    if closure:
+        return select(staff_closure.c.descendant_id.label('staff_id'), staff_closure.c.depth) \
+            .where(staff_closure.c.ancestor_id == staff_id) \
+            .subquery('subtree')
+    tree = select(Staff.staff_id, literal(0).label('depth')) \
+        .where(Staff.staff_id == staff_id) \
+        .cte('subtree', recursive=True)
+    return tree.union_all(select(Staff.staff_id, tree.c.depth + 1)
+                          .where(Staff.manager_id == tree.c.staff_id)
+                          .where(tree.c.depth < MAX_DEPTH))
+
+
+def reporting_chain(staff_id, closure=False):
+    """A selectable of (staff_id, depth) for staff_id and each of their
+    managers up to the top of the hierarchy, depth 1 being their manager."""
+    if closure:
+        return select(staff_closure.c.ancestor_id.label('staff_id'), staff_closure.c.depth) \
+            .where(staff_closure.c.descendant_id == staff_id) \
+            .subquery('reporting_chain')
+    tree = select(Staff.staff_id, Staff.manager_id, literal(0).label('depth')) \
+        .where(Staff.staff_id == staff_id) \
+        .cte('reporting_chain', recursive=True)
+    return tree.union_all(select(Staff.staff_id, Staff.manager_id, tree.c.depth + 1)
+                          .where(Staff.staff_id == tree.c.manager_id)
+                          .where(tree.c.depth < MAX_DEPTH))
+
+
+def _staff(session, tree, include_self):
+    statement = select(Staff).join(tree, tree.c.staff_id == Staff.staff_id) \
+        .order_by(tree.c.depth, Staff.staff_id)
+    if not include_self:
+        statement = statement.where(tree.c.depth > 0)
+    return session.execute(statement).scalars().all()
+
+
+def descendants(session, staff_id, include_self=False, closure=False):
+    """Everyone reporting to staff_id, directly or not, nearest first."""
+    return _staff(session, subtree(staff_id, closure), include_self)
+
+
+def ancestors(session, staff_id, include_self=False, closure=False):
+    """The managers of staff_id, their own manager first."""
+    return _staff(session, reporting_chain(staff_id, closure), include_self)
+
+
+def depth(session, staff_id, closure=False):
+    """The number of managers above staff_id, 0 for the top of the
+    hierarchy, or None if there is no such staff member."""
+    tree = reporting_chain(staff_id, closure)
+    return session.execute(select(func.max(tree.c.depth))).scalar()
+
+
+def subtree_orders(manager_id, closure=False):
+    """A select() of every Order handled by manager_id or anyone under them."""
+    tree = subtree(manager_id, closure)
+    return select(Order).where(Order.staff_id.in_(select(tree.c.staff_id)))
+
+
+def subtree_sales(session, manager_id, closure=False):
+    """(orders, units, revenue) of every order handled by manager_id or
+    anyone under them, in a single statement."""
+    tree = subtree(manager_id, closure)
+    revenue = Order_Item.quantity * Order_Item.list_price * (1 - Order_Item.discount)
+    return tuple(session.execute(
+        select(func.count(Order.order_id.distinct()),
+               func.coalesce(func.sum(Order_Item.quantity), 0),
+               func.coalesce(func.sum(revenue), 0.0))
+        .join(Order_Item, Order_Item.order_id == Order.order_id)
+        .where(Order.staff_id.in_(select(tree.c.staff_id)))).one())
@@ -0,0 +1,199 @@
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# expanding IN parameters render one placeholder per value, so collapse them
+# to make "IN (?, ?)" and "IN (?, ?, ?)" the same shape
+_IN_LIST = re.compile(r'\bIN \(\?(?:, \?)+\)')
+
+LAZY_LOAD_OPTION = 'instrumentation_lazy_load'
+
+Offender = namedtuple('Offender', ['relationship', 'shape', 'count', 'total_time'])
+
+
+def statement_shape(statement):
+    return _IN_LIST.sub('IN (?)', ' '.join(statement.split()))
+
+
+class StatementStats(object):
+
+    __slots__ = ('shape', 'count', 'total_time', 'max_time', 'rows', 'lazy_loads')
+
+    def __init__(self, shape):
+        self.shape = shape
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.rows = 0
+        self.lazy_loads = Counter()
+
+    def merge(self, other):
+        self.count += other.count
+        self.total_time += other.total_time
+        self.max_time = max(self.max_time, other.max_time)
+        self.rows += other.rows
+        self.lazy_loads.update(other.lazy_loads)
+
+    def __repr__(self):
+        return '<StatementStats count=%d total_time=%.6f rows=%d %r>' % (
+            self.count, self.total_time, self.rows, self.shape)
+
+
+class QueryRecorder(object):
+    """Record the statements run on an engine or by a session.
+
+    Every statement is timed and aggregated by its SQL shape, and lazy
+    relationship loads are tagged with the relationship that issued them.
+    In lightweight mode only those aggregates are kept and no rows are
+    counted, which keeps the per-statement cost to a couple of dict updates;
+    otherwise each execution is also kept in ``statements`` and the rows of
+    every ORM SELECT are counted.
+    """
+
+    def __init__(self, lightweight=False):
+        self.lightweight = lightweight
+        self.statements = []
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections = None
+        self._engine = None
+
+    # -- event handlers
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._connections is not None and conn not in self._connections:
+            return
+        conn.info.setdefault('instrumentation_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._connections is not None and conn not in self._connections:
+            return
+        elapsed = time.perf_counter() - conn.info['instrumentation_start'].pop()
+        relationship = context.execution_options.get(LAZY_LOAD_OPTION)
+        rows = cursor.rowcount if cursor.rowcount > 0 else 0
+        with self._lock:
+            stats = self._stats.get(statement)
+            if stats is None:
+                stats = self._stats[statement] = StatementStats(statement)
+            stats.count += 1
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+            stats.rows += rows
+            if relationship is not None:
+                stats.lazy_loads[relationship] += 1
+            if not self.lightweight:
+                record = dict(statement=statement, parameters=parameters, duration=elapsed,
+                              rows=rows, lazy_load=relationship)
+                self.statements.append(record)
+                # the first statement of the innermost ORM execute in progress
+                # on this thread is the one its buffered rows belong to
+                pending = getattr(self._local, 'pending', None)
+                if pending and pending[-1] is None:
+                    pending[-1] = (stats, record)
+
+    def _do_orm_execute(self, orm_execute_state):
+        if self._engine is not None and orm_execute_state.session.get_bind() is not self._engine:
+            return None
+        if orm_execute_state.is_relationship_load and orm_execute_state.lazy_loaded_from is not None:
+            relationship = orm_execute_state.loader_strategy_path.path[-1]
+            orm_execute_state.update_execution_options(**{LAZY_LOAD_OPTION: str(relationship)})
+        options = orm_execute_state.execution_options
+        if self.lightweight or not orm_execute_state.is_select \
+                or options.get('yield_per') or options.get('stream_results'):
+            return None
+        # buffer the result so its rows can be counted, then hand back an
+        # equivalent result; streaming queries are left alone above
+        # a stack, as buffering the rows can run further ORM executes, e.g.
+        # the query of a selectinload
+        pending = self._local.__dict__.setdefault('pending', [])
+        pending.append(None)
+        try:
+            frozen = orm_execute_state.invoke_statement().freeze()
+        finally:
+            last = pending.pop()
+        if last is not None:
+            stats, record = last
+            rows = len(frozen.data)
+            with self._lock:
+                stats.rows += rows - record['rows']
+                record['rows'] = rows
+        return frozen()
+
+    def _after_begin(self, session, transaction, connection):
+        self._connections.add(connection)
+
+    # -- attaching
+
+    @contextmanager
+    def capture(self, target):
+        """Record statements while the block runs. target is either an Engine,
+        in which case everything it executes is recorded, or a Session, in
+        which case only statements on that session's connections are."""
+        if isinstance(target, Engine):
+            # lazy loads are only visible through session events, so listen
+            # on every session and ignore those bound elsewhere
+            engine, session = target, Session
+            self._engine = engine
+        else:
+            engine, session = target.get_bind(), target
+            self._connections = set()
+            if session.in_transaction():
+                self._connections.add(session.connection())
+            event.listen(session, 'after_begin', self._after_begin)
+        event.listen(session, 'do_orm_execute', self._do_orm_execute)
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        try:
+            yield self
+        finally:
+            event.remove(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.remove(engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.remove(session, 'do_orm_execute', self._do_orm_execute)
+            if self._connections is not None:
+                event.remove(session, 'after_begin', self._after_begin)
+            self._connections = None
+            self._engine = None
+
+    # -- reporting
+
+    def stats(self):
+        """Return the aggregated StatementStats keyed by statement shape."""
+        with self._lock:
+            raw = list(self._stats.values())
+        merged = {}
+        for stats in raw:
+            shape = statement_shape(stats.shape)
+            if shape not in merged:
+                merged[shape] = StatementStats(shape)
+            merged[shape].merge(stats)
+        return merged
+
+    def n_plus_one(self, threshold=5):
+        """Return the lazy loads that issued the same statement shape at
+        least threshold times, worst first."""
+        offenders = []
+        for shape, stats in self.stats().items():
+            for relationship, count in stats.lazy_loads.items():
+                if count >= threshold:
+                    share = stats.total_time * count / stats.count
+                    offenders.append(Offender(relationship, shape, count, share))
+        return sorted(offenders, key=lambda offender: (offender.count, offender.total_time),
+                      reverse=True)
+
+    def report(self, limit=10, threshold=5):
+        lines = []
+        for stats in sorted(self.stats().values(), key=lambda stats: stats.total_time,
+                            reverse=True)[:limit]:
+            lines.append('%6d x %9.3f ms %8d rows  %s' % (stats.count, stats.total_time * 1000,
+                                                           stats.rows, stats.shape))
+        for offender in self.n_plus_one(threshold)[:limit]:
+            lines.append('N+1: %s lazy loaded %d times (%.3f ms)'
+                         % (offender.relationship, offender.count, offender.total_time * 1000))
+        return '\n'.join(lines)
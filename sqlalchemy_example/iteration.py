@@ -0,0 +1,78 @@
+from sqlalchemy import inspect, select, tuple_
+from sqlalchemy.orm import Query
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# values per IN () list, which keeps the number of bound parameters per
+# statement well below SQLite's limit
+IN_CHUNK_SIZE = 500
+
+
+def chunked(values, size=IN_CHUNK_SIZE):
+    """Split values into lists of at most size, e.g. to bind as IN () lists."""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _statement(query):
+    return query.statement if isinstance(query, Query) else query
+
+
+def _selects_entity(statement):
+    descriptions = statement.column_descriptions
+    return len(descriptions) == 1 and descriptions[0]['expr'] is descriptions[0]['entity'] \
+        and descriptions[0]['entity'] is not None
+
+
+def stream(session, statement, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the results of statement (a select() or legacy Query) in lists
+    of at most chunk_size. Rows are fetched from the cursor chunk by chunk,
+    so memory stays bounded and the first chunk is available as soon as it
+    has been read. A statement selecting a single entity yields instances,
+    anything else yields rows."""
+    statement = _statement(statement)
+    result = session.execute(statement, execution_options={'yield_per': chunk_size})
+    if _selects_entity(statement):
+        result = result.scalars()
+    for partition in result.partitions(chunk_size):
+        yield partition
+
+
+def keyset_pages(session, model, statement=None, page_size=DEFAULT_CHUNK_SIZE):
+    """Yield pages of at most page_size results in primary key order using
+    keyset pagination: each page is fetched with a fresh query that seeks
+    past the last key of the previous page, e.g. (order_id, item_id) for
+    Order_Item, instead of an OFFSET that rescans every earlier row.
+
+    statement defaults to select(model) and may add filters; when it selects
+    columns rather than the entity, the primary key columns must be among
+    them.
+    """
+    key = inspect(model).primary_key
+    statement = select(model) if statement is None else _statement(statement)
+    entities = _selects_entity(statement)
+    statement = statement.order_by(None).order_by(*key).limit(page_size)
+    last = None
+    while True:
+        page_statement = statement
+        if last is not None:
+            page_statement = statement.where(tuple_(*key) > tuple_(*last))
+        result = session.execute(page_statement)
+        page = result.scalars().all() if entities else result.all()
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        if entities:
+            mapper = inspect(model)
+            last = mapper.primary_key_from_instance(page[-1])
+        else:
+            last = [page[-1]._mapping[column] for column in key]
+
+
+def iter_keyset(session, model, statement=None, page_size=DEFAULT_CHUNK_SIZE):
+    for page in keyset_pages(session, model, statement, page_size):
+        for item in page:
+            yield item
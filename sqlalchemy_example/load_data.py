@@ -1,136 +1,168 @@
-from datetime import datetime
-from sqlalchemy_example.models import *
-
-def load_categories(session):
-    for category_id, category_name in [(1,'Children Bicycles'), (2,'Comfort Bicycles'),
-                                       (3,'Cruisers Bicycles'), (4,'Cyclocross Bicycles'),
-                                       (5,'Electric Bikes'), (6,'Mountain Bikes'),
-                                       (7,'Road Bikes')]:
-        category = Category(category_id=category_id, category_name=category_name)
-        session.add(category)
-    session.commit()
-
-
-def load_brands(session):
-    for brand_id, brand_name in [(1, 'Electra'), (2, 'Haro'), (3, 'Heller'),
-                                 (4, 'Pure Cycles'), (5, 'Ritchey'), (6, 'Strider'),
-                                 (7, 'Sun Bicycles'), (8, 'Surly'), (9, 'Trek')]:
-        brand = Brand(brand_id=brand_id, brand_name=brand_name)
-        session.add(brand)
-    session.commit()
-
-
-def load_products(session):
-    with open('sqlalchemy_example/data/products.csv', 'r') as datafile:
-        for line in datafile:
-            product_id, product_name, brand_id, category_id, model_year, list_price = line.split(',')
-            product = Product(product_id=product_id,
-                              product_name=product_name,
-                              brand_id=brand_id,
-                              category_id=category_id,
-                              model_year=model_year,
-                              list_price=list_price)
-            session.add(product)
-    session.commit()
-
-
-def load_customers(session):
-    with open('sqlalchemy_example/data/customers.csv', 'r') as datafile:
-        for line in datafile:
-            data = map(lambda x: x if x != 'NULL' else None, line.split(','))
-            first_name, last_name, phone, email, street, city, state, zip_code = data
-            customer = Customer(first_name=first_name,
-                                last_name=last_name,
-                                phone=phone,
-                                email=email,
-                                street=street,
-                                city=city,
-                                state=state,
-                                zip_code=zip_code)
-            session.add(customer)
-    session.commit()
-
-
-def load_stores(session):
-    for store_name, phone, email, street, city, state, zip_code in [
-        ('Santa Cruz Bikes', '(831) 476-4321', 'santacruz@bikes.shop', '3700 Portola Drive',  'Santa Cruz', 'CA', '95060'),
-        ('Baldwin Bikes', '(516) 379-8888', 'baldwin@bikes.shop', '4200 Chestnut Lane',  'Baldwin', 'NY', '11432'),
-        ('Rowlett Bikes', '(972) 530-5555', 'rowlett@bikes.shop', '8000 Fairway Avenue',  'Rowlett', 'TX', '75088')]:
-        store = Store(store_name=store_name,
-                      phone=phone,
-                      email=email,
-                      street=street,
-                      city=city,
-                      state=state,
-                      zip_code=zip_code)
-        session.add(store)
-    session.commit()
-
+import csv
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date
+from functools import lru_cache
+from itertools import islice
 
-def load_stocks(session):
-    with open('sqlalchemy_example/data/stocks.csv', 'r') as datafile:
-        for line in datafile:
-            store_id, product_id, quantity = line.split(',')
-            stock = Stock(store_id=store_id,
-                          product_id=product_id,
-                          quantity=quantity)
-            session.add(stock)
-    session.commit()
-
-
-def load_staff(session):
-    for staff_id, first_name, last_name, email, phone, active, store_id, manager_id in [
-            (1,'Fabiola','Jackson','fabiola.jackson@bikes.shop','(831) 555-5554',1,1,None),
-            (2,'Mireya','Copeland','mireya.copeland@bikes.shop','(831) 555-5555',1,1,1),
-            (3,'Genna','Serrano','genna.serrano@bikes.shop','(831) 555-5556',1,1,2),
-            (4,'Virgie','Wiggins','virgie.wiggins@bikes.shop','(831) 555-5557',1,1,2),
-            (5,'Jannette','David','jannette.david@bikes.shop','(516) 379-4444',1,2,1),
-            (6,'Marcelene','Boyer','marcelene.boyer@bikes.shop','(516) 379-4445',1,2,5),
-            (7,'Venita','Daniel','venita.daniel@bikes.shop','(516) 379-4446',1,2,5),
-            (8,'Kali','Vargas','kali.vargas@bikes.shop','(972) 530-5555',1,3,1),
-            (9,'Layla','Terrell','layla.terrell@bikes.shop','(972) 530-5556',1,3,7),
-            (10,'Bernardine','Houston','bernardine.houston@bikes.shop','(972) 530-5557',1,3,7)]:
-        staff = Staff(staff_id=staff_id,
-                      first_name=first_name,
-                      last_name=last_name,
-                      email=email,
-                      phone=phone,
-                      active=active,
-                      store_id=store_id,
-                      manager_id=manager_id)
-        session.add(staff)
-    session.commit()
+from sqlalchemy import Date, Float, Integer
 
+from sqlalchemy_example.models import *
 
-def load_orders(session):
-    with open('sqlalchemy_example/data/orders.csv', 'r') as datafile:
-        for line in datafile:
-            # 1,259,4,'20160101','20160103','20160103',1,2
-            order_id, customer_id, order_status, order_date, required_date, shipped_date, store_id, staff_id = line.split(',')
-            order_date = datetime.strptime(order_date, '%Y%m%d')
-            required_date = datetime.strptime(required_date, '%Y%m%d')
-            shipped_date = datetime.strptime(shipped_date, '%Y%m%d')if shipped_date != 'NULL' else None
-            order = Order(order_id=order_id,
-                          customer_id=customer_id,
-                          order_status=order_status,
-                          order_date=order_date,  # DATE
-                          required_date=required_date,  # DATE
-                          shipped_date=shipped_date,  # DATE
-                          store_id=store_id,
-                          staff_id=staff_id)
-            session.add(order)
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+DEFAULT_BATCH_SIZE = 1000
+
+# CSV file and column order for each table; the files carry no header row
+# and columns omitted here (e.g. customer_id) are assigned by the database
+SOURCES = {
+    'category': ('categories.csv', ('category_id', 'category_name')),
+    'brand': ('brands.csv', ('brand_id', 'brand_name')),
+    'product': ('products.csv', ('product_id', 'product_name', 'brand_id', 'category_id',
+                                 'model_year', 'list_price')),
+    'customer': ('customers.csv', ('first_name', 'last_name', 'phone', 'email',
+                                   'street', 'city', 'state', 'zip_code')),
+    'store': ('stores.csv', ('store_id', 'store_name', 'phone', 'email',
+                             'street', 'city', 'state', 'zip_code')),
+    'stock': ('stocks.csv', ('store_id', 'product_id', 'quantity')),
+    'staff': ('staff.csv', ('staff_id', 'first_name', 'last_name', 'email', 'phone',
+                            'active', 'store_id', 'manager_id')),
+    'order': ('orders.csv', ('order_id', 'customer_id', 'order_status', 'order_date',
+                             'required_date', 'shipped_date', 'store_id', 'staff_id')),
+    'order_item': ('order_items.csv', ('order_id', 'item_id', 'product_id', 'quantity',
+                                       'list_price', 'discount')),
+}
+
+NULL = 'NULL'
+
+
+@lru_cache(maxsize=8192)
+def _parse_date(value):
+    # dates are stored as YYYYMMDD and repeat heavily across orders
+    return date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+
+
+def _converter(column):
+    if isinstance(column.type, Integer):
+        convert = int
+    elif isinstance(column.type, Float):
+        convert = float
+    elif isinstance(column.type, Date):
+        convert = _parse_date
+    else:
+        convert = str
+    if not column.nullable:
+        return convert
+    return lambda value: None if value == NULL else convert(value)
+
+
+def model_for(table_name):
+    for mapper in Base.registry.mappers:
+        if mapper.local_table.name == table_name:
+            return mapper.class_
+    raise KeyError(table_name)
+
+
+def source_path(table_name, data_dir=None):
+    return os.path.join(data_dir or DATA_DIR, SOURCES[table_name][0])
+
+
+def read_rows(table_name, data_dir=None):
+    """Yield one dict per CSV line for table_name, with every value converted
+    according to the type and nullability of its Column."""
+    filename, names = SOURCES[table_name]
+    columns = Base.metadata.tables[table_name].columns
+    converters = [(name, _converter(columns[name])) for name in names]
+    with open(source_path(table_name, data_dir), 'r', newline='') as datafile:
+        for line in csv.reader(datafile, quoting=csv.QUOTE_NONE):
+            yield {name: convert(value) for (name, convert), value in zip(converters, line)}
+
+
+def batches(rows, batch_size):
+    rows = iter(rows)
+    batch = list(islice(rows, batch_size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, batch_size))
+
+
+def insert_batches(session, table_name, chunks, bulk=False):
+    # ORM mode builds one instance per row and lets the unit of work flush
+    # them; bulk mode sends each batch as a single executemany INSERT and
+    # never touches the identity map
+    model = model_for(table_name)
+    for batch in chunks:
+        if bulk:
+            session.execute(model.__table__.insert(), batch)
+        else:
+            instances = [model(**row) for row in batch]
+            session.add_all(instances)
+            session.flush()
+            for instance in instances:
+                session.expunge(instance)
     session.commit()
 
 
-def load_order_items(session):
-    with open('sqlalchemy_example/data/order_items.csv', 'r') as datafile:
-        for line in datafile:
-            order_id, item_id, product_id, quantity, list_price, discount = line.split(',')
-            order_item = Order_Item(order_id=order_id,
-                                    item_id=item_id,
-                                    product_id=product_id,
-                                    quantity=quantity,
-                                    list_price=list_price,
-                                    discount=discount)
-            session.add(order_item)
-    session.commit()
+def load_table(session, table_name, bulk=False, batch_size=DEFAULT_BATCH_SIZE, data_dir=None):
+    chunks = batches(read_rows(table_name, data_dir), batch_size)
+    insert_batches(session, table_name, chunks, bulk)
+
+
+def load_all(session, bulk=False, batch_size=DEFAULT_BATCH_SIZE, data_dir=None):
+    for table in Base.metadata.sorted_tables:
+        if table.name in SOURCES:
+            load_table(session, table.name, bulk, batch_size, data_dir)
+
+
+def _parse_table(table_name, data_dir, batch_size):
+    return list(batches(read_rows(table_name, data_dir), batch_size))
+
+
+def dependencies(table):
+    return {key.column.table.name for key in table.foreign_keys} - {table.name}
+
+
+def load_all_parallel(session, bulk=False, batch_size=DEFAULT_BATCH_SIZE, data_dir=None,
+                      workers=None):
+    """Parse every source CSV concurrently in a process pool while this
+    process, as the single writer, inserts each table as soon as it is
+    parsed and every table it references has been written."""
+    tables = [table for table in Base.metadata.sorted_tables if table.name in SOURCES]
+    pending = {table.name: dependencies(table) & set(SOURCES) for table in tables}
+    written = set()
+    parsed = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_parse_table, table.name, data_dir, batch_size): table.name
+                   for table in tables}
+        running = set(futures)
+        while pending:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                parsed[futures[future]] = future.result()
+            for table in tables:
+                name = table.name
+                if name in pending and name in parsed and pending[name] <= written:
+                    insert_batches(session, name, parsed.pop(name), bulk)
+                    written.add(name)
+                    del pending[name]
+
+
+def format_value(value):
+    # the inverse of the converters used by read_rows
+    if value is None:
+        return NULL
+    if isinstance(value, date):
+        return value.strftime('%Y%m%d')
+    value = str(value)
+    if ',' in value or '\n' in value:
+        raise ValueError('value cannot be written to an unquoted CSV field: %r' % value)
+    return value
+
+
+def write_rows(table_name, rows, path):
+    """Write rows (mappings or sequences in SOURCES column order) to path in
+    the format read_rows expects."""
+    names = SOURCES[table_name][1]
+    with open(path, 'w', newline='') as datafile:
+        for row in rows:
+            values = [row[name] for name in names] if hasattr(row, 'keys') else row
+            datafile.write(','.join(format_value(value) for value in values) + '\n')
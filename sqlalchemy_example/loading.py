@@ -0,0 +1,88 @@
+from collections import namedtuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Load, raiseload
+
+# many_to_one and collection name the loader strategy used for each kind of
+# relationship; raise_others makes every relationship the profile
+# does not load raise instead of lazy loading
+Profile = namedtuple('Profile', ['many_to_one', 'collection', 'raise_others'])
+
+PROFILES = {
+    # reporting reads many parents at once, so avoid JOINs that repeat
+    # parent columns and load each relationship with one extra SELECT
+    'reporting': Profile('selectinload', 'selectinload', False),
+    'api': Profile('joinedload', 'selectinload', False),
+    'strict': Profile('joinedload', 'selectinload', True),
+}
+
+PROFILE_OPTION = 'loading_profile'
+
+
+def _relationships(mapper, seen, collections):
+    # many-to-one relationships are always followed since each adds at most
+    # one row per parent; collections only when they hang off the root, as
+    # backrefs such as Store.orders would otherwise pull in whole tables
+    for relationship in mapper.relationships:
+        if relationship.mapper.class_ in seen:
+            continue
+        if relationship.uselist and not collections:
+            continue
+        yield relationship
+
+
+def _paths(mapper, seen, collections=True):
+    for relationship in _relationships(mapper, seen, collections):
+        yield [relationship]
+        for path in _paths(relationship.mapper, seen | {relationship.mapper.class_}, False):
+            yield [relationship] + path
+
+
+def loader_options(entity, profile='api'):
+    """Return the loader options that eagerly load entity's relationship graph
+    according to the named profile."""
+    profile = PROFILES[profile]
+    mapper = inspect(entity)
+    options = []
+    for path in _paths(mapper, {mapper.class_}):
+        option = Load(entity)
+        for relationship in path:
+            strategy = profile.collection if relationship.uselist else profile.many_to_one
+            option = getattr(option, strategy)(relationship.class_attribute)
+        options.append(option)
+        if profile.raise_others:
+            options.append(option.raiseload('*'))
+    if profile.raise_others:
+        options.append(raiseload('*'))
+    return options
+
+
+def with_profile(query, profile='api'):
+    """Apply the named profile to every entity selected by query, which may
+    be a legacy Query or a select() statement."""
+    for description in query.column_descriptions:
+        if description['entity'] is not None and description['expr'] is description['entity']:
+            query = query.options(*loader_options(description['entity'], profile))
+    return query
+
+
+def _apply_profile(orm_execute_state):
+    profile = orm_execute_state.execution_options.get(PROFILE_OPTION,
+                                                      orm_execute_state.session.info.get(PROFILE_OPTION))
+    if profile is None or not orm_execute_state.is_select:
+        return
+    if orm_execute_state.is_relationship_load or orm_execute_state.is_column_load:
+        return
+    orm_execute_state.statement = with_profile(orm_execute_state.statement, profile)
+
+
+def use_profile(session, profile='api'):
+    """Make the named profile the default for every ORM SELECT session runs.
+    A single statement can choose another profile with the execution option
+    loading_profile, or opt out with loading_profile=None."""
+    if profile is not None and profile not in PROFILES:
+        raise KeyError(profile)
+    session.info[PROFILE_OPTION] = profile
+    if not event.contains(session, 'do_orm_execute', _apply_profile):
+        event.listen(session, 'do_orm_execute', _apply_profile)
+    return session
@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Date, Float, ForeignKey, Integer, String, Table
+from sqlalchemy import Column, Date, Float, ForeignKey, Index, Integer, MetaData, String, Table
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
 Base = declarative_base()
 
+# tables of opt-in features (full-text search, sales summaries, the staff
+# closure) are declared here rather than on Base.metadata, so that
+# create_all() and the cached template databases are unaffected until a
+# feature is enabled; each feature creates only its own tables
+feature_metadata = MetaData()
+
 class Category(Base):
 
     __tablename__ = 'category'
@@ -26,8 +32,8 @@ class Product(Base):
 
     product_id = Column(Integer, primary_key=True)
     product_name = Column(String(255), nullable=False)
-    brand_id = Column(Integer, ForeignKey(Brand.brand_id), nullable=False)
-    category_id = Column(Integer, ForeignKey('category.category_id'), nullable=False)
+    brand_id = Column(Integer, ForeignKey(Brand.brand_id), nullable=False, index=True)
+    category_id = Column(Integer, ForeignKey('category.category_id'), nullable=False, index=True)
     model_year = Column(Integer, nullable=False)
     list_price = Column(Float, nullable=False)
 
@@ -54,6 +60,9 @@ class Customer(Base):
     state = Column(String(25))
     zip_code = Column(String(5))
 
+    # customers are filtered by state and then grouped or filtered by city
+    __table_args__ = (Index('ix_customer_state_city', state, city),)
+
 
 class Store(Base):
 
@@ -80,7 +89,7 @@ class Staff(Base):
     phone = Column(String(25))
     active = Column(Integer, nullable=False)
     store_id = Column(Integer, ForeignKey(Store.store_id), nullable=False)
-    manager_id = Column(Integer, ForeignKey('staff.staff_id'))
+    manager_id = Column(Integer, ForeignKey('staff.staff_id'), index=True)
 
     # each staff member belongs to only one store, i.e. a one-to-many
     # relationship where parent = Store and child = Staff
@@ -96,13 +105,13 @@ class Order(Base):
     __tablename__ = 'order'
 
     order_id = Column(Integer, primary_key=True)
-    customer_id = Column(Integer, ForeignKey(Customer.customer_id))
+    customer_id = Column(Integer, ForeignKey(Customer.customer_id), index=True)
     order_status = Column(Integer, nullable=False)
     order_date = Column(Date, nullable=False)
     required_date = Column(Date, nullable=False)
     shipped_date = Column(Date)
-    store_id = Column(Integer, ForeignKey(Store.store_id), nullable=False)
-    staff_id = Column(Integer, ForeignKey(Staff.staff_id), nullable=False)
+    store_id = Column(Integer, ForeignKey(Store.store_id), nullable=False, index=True)
+    staff_id = Column(Integer, ForeignKey(Staff.staff_id), nullable=False, index=True)
 
     # each order belongs to only one customer, i.e. a one-to-many
     # relationship where parent = Customer and child = Order
@@ -122,7 +131,7 @@ class Order_Item(Base):
 
     order_id = Column(Integer, ForeignKey(Order.order_id), primary_key=True)
     item_id = Column(Integer, primary_key=True)
-    product_id = Column(Integer, ForeignKey(Product.product_id), nullable=False)
+    product_id = Column(Integer, ForeignKey(Product.product_id), nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
     list_price = Column(Float, nullable=False)
     discount = Column(Float, nullable=False, default=0)
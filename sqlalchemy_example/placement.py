@@ -0,0 +1,220 @@
+import random
+import time
+from collections import OrderedDict, namedtuple
+from datetime import date, timedelta
+
+from sqlalchemy import bindparam, func, select, tuple_
+from sqlalchemy.exc import OperationalError
+
+from sqlalchemy_example.iteration import chunked
+from sqlalchemy_example.models import Customer, Order, Order_Item, Product, Staff, Stock, Store
+
+# order_status of a newly placed order
+PENDING = 1
+
+DEFAULT_LEAD_DAYS = 3
+DEFAULT_RETRIES = 5
+
+# session.info key of an inclusive (first, last) range new order ids must
+# come from, as set on the sessions of a sharding.ShardSet
+ORDER_ID_RANGE = 'order_id_range'
+
+# lines are (product_id, quantity) or (product_id, quantity, discount);
+# order_date defaults to today and required_date to DEFAULT_LEAD_DAYS later
+OrderRequest = namedtuple('OrderRequest', ['customer_id', 'store_id', 'staff_id', 'lines',
+                                           'order_date', 'required_date'],
+                          defaults=(None, None))
+
+Shortage = namedtuple('Shortage', ['product_id', 'requested', 'available'])
+Failure = namedtuple('Failure', ['index', 'reason', 'shortages'])
+Placement = namedtuple('Placement', ['placed', 'failed'])
+
+_stock = Stock.__table__
+
+_reserve = _stock.update() \
+    .where(_stock.c.store_id == bindparam('b_store_id')) \
+    .where(_stock.c.product_id == bindparam('b_product_id')) \
+    .where(_stock.c.quantity == bindparam('b_expected')) \
+    .values(quantity=_stock.c.quantity - bindparam('b_reserved'))
+
+
+class _Conflict(Exception):
+    pass
+
+
+def _demand(request):
+    # units per product, or a reason the request cannot be placed at all
+    if not request.lines:
+        return None, 'no lines'
+    demand = OrderedDict()
+    for line in request.lines:
+        product_id, quantity = line[0], line[1]
+        if quantity <= 0:
+            return None, 'quantity of product %d must be positive' % product_id
+        demand[product_id] = demand.get(product_id, 0) + quantity
+    return demand, None
+
+
+def _existing(session, column, values):
+    found = set()
+    for chunk in chunked(values):
+        found.update(session.execute(select(column).where(column.in_(chunk))).scalars())
+    return found
+
+
+def _read(session, requests, keys, product_ids):
+    stock, prices = {}, {}
+    for chunk in chunked(keys):
+        statement = select(Stock.store_id, Stock.product_id, Stock.quantity) \
+            .where(tuple_(Stock.store_id, Stock.product_id).in_(chunk))
+        for store_id, product_id, quantity in session.execute(statement):
+            stock[(store_id, product_id)] = quantity or 0
+    for chunk in chunked(product_ids):
+        prices.update(session.execute(select(Product.product_id, Product.list_price)
+                                      .where(Product.product_id.in_(chunk))).all())
+    # the customers, stores and staff the orders refer to, so that a bad id
+    # fails its own order rather than the bulk insert of the whole batch
+    known = {name: _existing(session, column, {getattr(request, name) for request in requests
+                                               if getattr(request, name) is not None})
+             for name, column in (('customer_id', Customer.customer_id),
+                                  ('store_id', Store.store_id),
+                                  ('staff_id', Staff.staff_id))}
+    return stock, prices, known
+
+
+def _unknown(request, demand, prices, known):
+    for name in ('customer_id', 'store_id', 'staff_id'):
+        value = getattr(request, name)
+        # orders may have no customer, but must have a store and staff member
+        if value is None and name == 'customer_id':
+            continue
+        if value not in known[name]:
+            return 'unknown %s %s' % (name[:-len('_id')], value)
+    unknown = [product_id for product_id in demand if product_id not in prices]
+    if unknown:
+        return 'unknown product %s' % ', '.join(map(str, unknown))
+    return None
+
+
+def _allocate(requests, demands, stock, prices, known):
+    remaining = dict(stock)
+    accepted, failed = [], []
+    for index, (request, (demand, reason)) in enumerate(zip(requests, demands)):
+        if reason is None:
+            reason = _unknown(request, demand, prices, known)
+        if reason is not None:
+            failed.append(Failure(index, reason, []))
+            continue
+        shortages = [Shortage(product_id, quantity,
+                              remaining.get((request.store_id, product_id), 0))
+                     for product_id, quantity in demand.items()
+                     if quantity > remaining.get((request.store_id, product_id), 0)]
+        if shortages:
+            failed.append(Failure(index, 'insufficient stock', shortages))
+            continue
+        for product_id, quantity in demand.items():
+            remaining[(request.store_id, product_id)] -= quantity
+        accepted.append(index)
+    return accepted, failed, remaining
+
+
+def _place(session, requests, demands, today):
+    keys = {(request.store_id, product_id)
+            for request, (demand, _) in zip(requests, demands) if demand
+            for product_id in demand}
+    stock, prices, known = _read(session, requests, sorted(keys),
+                                 sorted({key[1] for key in keys}))
+    accepted, failed, remaining = _allocate(requests, demands, stock, prices, known)
+
+    # optimistic check: each row is only decremented if it still holds the
+    # quantity read above, otherwise another writer got there first
+    reservations = [dict(b_store_id=key[0], b_product_id=key[1], b_expected=stock[key],
+                         b_reserved=stock[key] - remaining[key])
+                    for key in sorted(stock) if remaining[key] != stock[key]]
+    if reservations:
+        if session.execute(_reserve, reservations).rowcount != len(reservations):
+            raise _Conflict()
+
+    if not accepted:
+        return Placement([], failed)
+    # the stock update holds SQLite's write lock, so no other writer can
+    # take these order ids before this transaction commits
+    next_id = next_order_id(session, len(accepted))
+    orders, items, placed = [], [], []
+    for order_id, index in enumerate(accepted, next_id):
+        request = requests[index]
+        order_date = request.order_date or today
+        orders.append(dict(order_id=order_id, customer_id=request.customer_id,
+                           order_status=PENDING, order_date=order_date,
+                           required_date=request.required_date
+                           or order_date + timedelta(days=DEFAULT_LEAD_DAYS),
+                           shipped_date=None, store_id=request.store_id,
+                           staff_id=request.staff_id))
+        for item_id, line in enumerate(request.lines, 1):
+            items.append(dict(order_id=order_id, item_id=item_id, product_id=line[0],
+                              quantity=line[1], list_price=prices[line[0]],
+                              discount=line[2] if len(line) > 2 else 0))
+        placed.append((index, order_id))
+    session.execute(Order.__table__.insert(), orders)
+    session.execute(Order_Item.__table__.insert(), items)
+    return Placement(placed, failed)
+
+
+def next_order_id(session, count=1):
+    """The first of count unused order ids, after the highest id in use in
+    the session's ORDER_ID_RANGE, if it has one. Raises RuntimeError if the
+    range has fewer than count ids left."""
+    first, last = session.info.get(ORDER_ID_RANGE, (1, None))
+    statement = select(func.max(Order.order_id)).where(Order.order_id >= first)
+    if last is not None:
+        statement = statement.where(Order.order_id <= last)
+    next_id = (session.execute(statement).scalar() or first - 1) + 1
+    if last is not None and next_id + count - 1 > last:
+        raise RuntimeError('no order ids left in %d..%d' % (first, last))
+    return next_id
+
+
+def _busy(error):
+    message = str(error.orig).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def place_orders(session, requests, retries=DEFAULT_RETRIES, today=None):
+    """Place a batch of OrderRequests in one transaction and commit.
+
+    Stock for every (store_id, product_id) in the batch is read once, the
+    requests are allocated from it in order, and the reserved units are
+    taken off with a single executemany UPDATE that checks each row still
+    holds the quantity that was read. The accepted orders and their items
+    are then bulk inserted at the products' list prices.
+
+    Returns a Placement of (index, order_id) pairs for the orders placed and
+    a Failure for each request that was not, e.g. with the Shortages of an
+    order there was insufficient stock for, or for an unknown customer,
+    store, staff member or product. If another writer changes the stock in
+    between, the whole batch is rolled back and retried, up to retries
+    times, before RuntimeError is raised. Any other error rolls the whole
+    batch back before it is raised.
+    """
+    requests = list(requests)
+    demands = [_demand(request) for request in requests]
+    today = today or date.today()
+    for attempt in range(retries + 1):
+        try:
+            placement = _place(session, requests, demands, today)
+            session.commit()
+            return placement
+        except _Conflict:
+            session.rollback()
+        except OperationalError as error:
+            # in WAL mode a write on a snapshot older than the last commit
+            # fails at once with SQLITE_BUSY, which is the same conflict
+            session.rollback()
+            if not _busy(error):
+                raise
+        except BaseException:
+            # leave nothing of a failed batch for the caller to commit
+            session.rollback()
+            raise
+        time.sleep(random.uniform(0, 0.001 * 2 ** attempt))
+    raise RuntimeError('stock changed concurrently; gave up after %d attempts' % (retries + 1))
@@ -0,0 +1,34 @@
+from collections import namedtuple
+from functools import lru_cache
+
+from sqlalchemy import inspect, select
+
+
+@lru_cache(maxsize=None)
+def row_class(model):
+    """Return an immutable tuple-backed class with one field per mapped
+    column of model, e.g. CustomerRow(customer_id, first_name, ...)."""
+    return namedtuple(model.__name__ + 'Row', [attr.key for attr in inspect(model).column_attrs])
+
+
+def select_rows(model):
+    """Return a Core select() of the table columns behind every mapped
+    attribute of model, in row_class(model) field order. It can be refined
+    with where(), order_by() etc. and passed to fetch_rows()."""
+    return select(*[attr.columns[0] for attr in inspect(model).column_attrs])
+
+
+def iter_rows(session, model, statement=None):
+    """Yield one read-only row per result of statement (by default every row
+    of model's table). The statement runs as a plain Core select, so nothing
+    is added to the session's identity map and no instance state or change
+    tracking is created."""
+    if statement is None:
+        statement = select_rows(model)
+    make = row_class(model)._make
+    for row in session.execute(statement):
+        yield make(row)
+
+
+def fetch_rows(session, model, statement=None):
+    return list(iter_rows(session, model, statement))
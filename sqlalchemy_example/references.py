@@ -0,0 +1,221 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from itertools import chain
+
+from sqlalchemy import event, inspect, tuple_
+
+from sqlalchemy_example.models import Brand, Category, Staff, Store
+from sqlalchemy_example.readonly import row_class, select_rows
+
+REFERENCE_MODELS = (Category, Brand, Store, Staff)
+
+DEFAULT_MAX_SIZE = 4096
+DEFAULT_TTL = 300.0
+
+PENDING = 'references_pending'
+
+
+class CacheStats(namedtuple('CacheStats', ['hits', 'misses', 'evictions', 'invalidations',
+                                           'size'])):
+
+    __slots__ = ()
+
+    @property
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ReferenceCache(object):
+    """A process-wide read-through cache of the small reference tables.
+
+    Lookups return read-only rows (see sqlalchemy_example.readonly) rather
+    than mapped instances, so a cached entry can be shared between sessions
+    and threads without being attached to any of them. Entries expire ttl
+    seconds after they were loaded and the least recently used are evicted
+    beyond max_size. Sessions passed to track() invalidate exactly the rows
+    they change when they commit or roll back, and rows they read while
+    they have uncommitted changes to a model are not cached.
+    """
+
+    def __init__(self, models=REFERENCE_MODELS, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL,
+                 clock=time.monotonic):
+        self.models = frozenset(models)
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        # bumped by every invalidation of a model, so a load that raced one
+        # is not stored
+        self._generations = dict.fromkeys(self.models, 0)
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._evictions = self._invalidations = 0
+
+    # -- lookups
+
+    def _key(self, model, key):
+        if model not in self.models:
+            raise KeyError('%s is not a cached reference model' % model.__name__)
+        return key if isinstance(key, tuple) else (key,)
+
+    def _cached(self, model, key, now):
+        entry = self._entries.get((model, key))
+        if entry is None:
+            return False, None
+        if entry[1] <= now:
+            del self._entries[(model, key)]
+            self._evictions += 1
+            return False, None
+        self._entries.move_to_end((model, key))
+        return True, entry[0]
+
+    def get(self, session, model, key):
+        """Return the row of model with primary key key, loading it through
+        session on a miss, or None if there is no such row."""
+        return self.get_many(session, model, [key]).get(key)
+
+    def get_many(self, session, model, keys):
+        """Return a dict of the rows of model for keys, loading every miss
+        with a single SELECT. Keys with no row are left out."""
+        found, missing = {}, []
+        now = self._clock()
+        with self._lock:
+            for key in keys:
+                hit, row = self._cached(model, self._key(model, key), now)
+                if hit:
+                    self._hits += 1
+                    if row is not None:
+                        found[key] = row
+                else:
+                    self._misses += 1
+                    missing.append(key)
+            generation = self._generations[model]
+        if missing:
+            loaded = self._load(session, model, missing)
+            # rows read through a session with uncommitted changes to model
+            # are returned to it but never shared
+            shareable = not self._writing(session, model)
+            with self._lock:
+                current = shareable and self._generations[model] == generation
+                for key in missing:
+                    row = loaded.get(self._key(model, key))
+                    if current:
+                        self._store(model, self._key(model, key), row, now + self.ttl)
+                    if row is not None:
+                        found[key] = row
+        return found
+
+    def _writing(self, session, model):
+        # flushed changes are recorded by the listeners track() installs;
+        # unflushed ones may be flushed by the load itself
+        if any(written is model for written, key in session.info.get(PENDING, ())):
+            return True
+        return any(inspect(instance).class_ is model
+                   for instance in chain(session.new, session.dirty, session.deleted))
+
+    def _load(self, session, model, keys):
+        mapper = inspect(model)
+        columns = mapper.primary_key
+        keys = set(self._key(model, key) for key in keys)
+        if len(columns) == 1:
+            statement = select_rows(model).where(columns[0].in_([key for (key,) in keys]))
+        else:
+            statement = select_rows(model).where(tuple_(*columns).in_(keys))
+        make = row_class(model)._make
+        positions = [[attr.columns[0] for attr in mapper.column_attrs].index(column)
+                     for column in columns]
+        rows = {}
+        for values in session.execute(statement):
+            rows[tuple(values[position] for position in positions)] = make(values)
+        return rows
+
+    def _store(self, model, key, row, expires):
+        # misses are cached too, as None, so repeated lookups of a missing
+        # key do not each go to the database
+        self._entries[(model, key)] = (row, expires)
+        self._entries.move_to_end((model, key))
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    # -- invalidation
+
+    def invalidate(self, model, key=None):
+        """Drop the cached row of model with primary key key, or every cached
+        row of model if key is None."""
+        with self._lock:
+            self._generations[model] += 1
+            if key is None:
+                stale = [entry for entry in self._entries if entry[0] is model]
+            else:
+                stale = [(model, self._key(model, key))]
+            for entry in stale:
+                if self._entries.pop(entry, None) is not None:
+                    self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for model in self._generations:
+                self._generations[model] += 1
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+
+    def _after_flush(self, session, flush_context):
+        changed = session.info.setdefault(PENDING, set())
+        for instance in chain(session.new, session.dirty, session.deleted):
+            state = inspect(instance)
+            if state.class_ not in self.models:
+                continue
+            # new rows may replace a cached miss; changed keys stale the old one
+            changed.add((state.class_, tuple(state.mapper.primary_key_from_instance(instance))))
+            if state.identity is not None:
+                changed.add((state.class_, state.identity))
+        for model, key in changed:
+            self.invalidate(model, key)
+
+    def _do_orm_execute(self, orm_execute_state):
+        # Core and ORM-enabled INSERT, UPDATE and DELETE statements bypass
+        # the flush, so the whole table they write to is invalidated. The
+        # statement of an ORM-enabled one holds an annotated copy of the
+        # table, so tables are matched by name
+        if orm_execute_state.is_select:
+            return
+        name = getattr(getattr(orm_execute_state.statement, 'table', None), 'name', None)
+        for model in self.models:
+            if model.__table__.name == name:
+                session = orm_execute_state.session
+                session.info.setdefault(PENDING, set()).add((model, None))
+                self.invalidate(model)
+
+    def _end_transaction(self, session, *args):
+        # rows read between the flush and the end of the transaction may be
+        # uncommitted (or, in other sessions, out of date), so drop them again
+        for model, key in session.info.pop(PENDING, ()):
+            self.invalidate(model, key)
+
+    def track(self, session):
+        """Invalidate the rows session changes, at flush and again when its
+        transaction commits or rolls back. session may be a Session, a
+        sessionmaker or the Session class itself."""
+        for name, listener in (('after_flush', self._after_flush),
+                               ('do_orm_execute', self._do_orm_execute),
+                               ('after_commit', self._end_transaction),
+                               ('after_soft_rollback', self._end_transaction)):
+            if not event.contains(session, name, listener):
+                event.listen(session, name, listener)
+        return session
+
+    # -- reporting
+
+    def stats(self):
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions, self._invalidations,
+                              len(self._entries))
+
+    def reset_stats(self):
+        with self._lock:
+            self._hits = self._misses = self._evictions = self._invalidations = 0
+
+
+reference_cache = ReferenceCache()
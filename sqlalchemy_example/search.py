@@ -0,0 +1,99 @@
+import re
+
+from sqlalchemy import Column, Integer, String, Table, func, literal_column, select, text
+
+from sqlalchemy_example.models import Product, feature_metadata
+
+SEARCH_TABLE = 'product_search'
+
+# bm25() weights for product_name, brand_name and category_name: a match in
+# the product's own name ranks above one that only hits its brand or category
+WEIGHTS = (10.0, 5.0, 1.0)
+
+# created as an FTS5 virtual table by enable_search(), never by create_all()
+product_search = Table(SEARCH_TABLE, feature_metadata,
+                       Column('rowid', Integer, primary_key=True),
+                       Column('product_name', String),
+                       Column('brand_name', String),
+                       Column('category_name', String))
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+_INDEXED = '''SELECT p.product_id, p.product_name, b.brand_name, c.category_name
+              FROM product AS p
+              JOIN brand AS b ON b.brand_id = p.brand_id
+              JOIN category AS c ON c.category_id = p.category_id'''
+
+_DDL = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS product_search
+       USING fts5(product_name, brand_name, category_name,
+                  tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')''',
+    '''CREATE TRIGGER IF NOT EXISTS product_search_insert AFTER INSERT ON product BEGIN
+         INSERT INTO product_search (rowid, product_name, brand_name, category_name)
+         ''' + _INDEXED + ''' WHERE p.product_id = new.product_id;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS product_search_update AFTER UPDATE ON product BEGIN
+         DELETE FROM product_search WHERE rowid = old.product_id;
+         INSERT INTO product_search (rowid, product_name, brand_name, category_name)
+         ''' + _INDEXED + ''' WHERE p.product_id = new.product_id;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS product_search_delete AFTER DELETE ON product BEGIN
+         DELETE FROM product_search WHERE rowid = old.product_id;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS product_search_brand AFTER UPDATE OF brand_name ON brand BEGIN
+         UPDATE product_search SET brand_name = new.brand_name
+         WHERE rowid IN (SELECT product_id FROM product WHERE brand_id = new.brand_id);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS product_search_category
+       AFTER UPDATE OF category_name ON category BEGIN
+         UPDATE product_search SET category_name = new.category_name
+         WHERE rowid IN (SELECT product_id FROM product WHERE category_id = new.category_id);
+       END''',
+]
+
+
+def enable_search(session):
+    """Create the product_search FTS5 table and the triggers that keep it in
+    step with product, brand and category, index the current products and
+    commit. Safe to call again on a database that already has them."""
+    for statement in _DDL:
+        session.execute(text(statement))
+    rebuild_search_index(session)
+    session.commit()
+    return session
+
+
+def rebuild_search_index(session):
+    session.execute(product_search.delete())
+    session.execute(text('INSERT INTO product_search (rowid, product_name, brand_name, '
+                         'category_name) ' + _INDEXED))
+
+
+def match_expression(terms, prefix=True):
+    """Turn free text into an FTS5 query matching every word in it, e.g.
+    'electra cruiser' -> '"electra"* "cruiser"*'. Words are quoted so that
+    FTS5 operators and punctuation in user input are matched literally."""
+    words = _TERM.findall(terms)
+    suffix = '*' if prefix else ''
+    return ' '.join('"%s"%s' % (word, suffix) for word in words)
+
+
+def search_statement(terms, prefix=True):
+    """Return a select() of the Products matching terms, best match first.
+    It can be refined with where(), limit() etc. before it is executed."""
+    rank = func.bm25(literal_column(SEARCH_TABLE), *WEIGHTS)
+    return select(Product) \
+        .join(product_search, product_search.c.rowid == Product.product_id) \
+        .where(literal_column(SEARCH_TABLE).op('MATCH')(match_expression(terms, prefix))) \
+        .order_by(rank, Product.product_id)
+
+
+def search_products(session, terms, limit=20, prefix=True):
+    """Return up to limit ranked Products whose name, brand or category
+    contains every word of terms (as a prefix unless prefix=False)."""
+    if not _TERM.search(terms):
+        return []
+    statement = search_statement(terms, prefix)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return session.execute(statement).scalars().all()
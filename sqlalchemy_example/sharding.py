@@ -0,0 +1,213 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import sessionmaker
+
+from sqlalchemy_example.create_session import _fresh_connection, clone_template
+from sqlalchemy_example.load_data import DEFAULT_BATCH_SIZE
+from sqlalchemy_example.models import Order, Order_Item, Stock
+from sqlalchemy_example.placement import ORDER_ID_RANGE, next_order_id
+
+# tables whose rows belong to a single store; every other table is copied to
+# each shard in full. Staff is replicated rather than sharded because
+# manager_id chains cross stores.
+SHARDED = {
+    'order': 'store_id = :store_id',
+    'order_item': 'order_id IN (SELECT order_id FROM "order" WHERE store_id = :store_id)',
+    'stock': 'store_id = :store_id',
+}
+
+# orders placed on a shard take ids from a block reserved for its store, so
+# order ids stay unique across shards; ids from before sharding must be
+# below every block
+ORDER_ID_BLOCK = 10 ** 9
+
+
+def order_id_range(store_id):
+    """The inclusive range of ids of orders placed on store_id's shard."""
+    return store_id * ORDER_ID_BLOCK + 1, (store_id + 1) * ORDER_ID_BLOCK
+
+
+def _assign_order_ids(session, flush_context, instances):
+    # orders added without an id would otherwise get SQLite's max(rowid) + 1
+    new = [instance for instance in session.new
+           if isinstance(instance, Order) and instance.order_id is None]
+    if new:
+        for order_id, order in enumerate(new, next_order_id(session, len(new))):
+            order.order_id = order_id
+
+
+def _query(path, sql, parameters):
+    # runs in a worker process, so it opens its own read-only connection
+    connection = sqlite3.connect('file:%s?mode=ro' % quote(os.path.abspath(path)), uri=True)
+    try:
+        return connection.execute(sql, parameters).fetchall()
+    finally:
+        connection.close()
+
+
+def _merge(results, keys):
+    # sums every non-key column of rows with the same leading key columns,
+    # so only decomposable aggregates such as SUM and COUNT merge correctly
+    merged = {}
+    for rows in results:
+        for row in rows:
+            key, values = tuple(row[:keys]), row[keys:]
+            if key in merged:
+                merged[key] = [total + (value or 0) for total, value in zip(merged[key], values)]
+            else:
+                merged[key] = [value or 0 for value in values]
+    return sorted(key + tuple(values) for key, values in merged.items())
+
+
+class ShardSet(object):
+    """One SQLite file per store, each holding that store's orders, order
+    items and stock plus a full copy of every other table.
+
+    ``session(store_id)`` returns a session on one store's shard for reads
+    and writes. New orders placed or added through it take ids from
+    order_id_range(store_id), so order ids stay unique across shards.
+    ``scatter_gather()`` runs a statement on every shard in a pool of worker
+    processes and merges the results.
+    """
+
+    def __init__(self, paths, directory=None, workers=None):
+        self.paths = dict(paths)
+        self._directory = directory
+        self.workers = workers
+        self._executor = None
+        self.engines = {}
+        self._sessions = {}
+        for store_id, path in self.paths.items():
+            # a URI, like the workers' connections, so any path survives
+            engine = create_engine('sqlite:///file:%s?uri=true' % quote(os.path.abspath(path)))
+            event.listen(engine, 'connect', self._connect)
+            self.engines[store_id] = engine
+            self._sessions[store_id] = sessionmaker(
+                bind=engine, info={ORDER_ID_RANGE: order_id_range(store_id)})
+            event.listen(self._sessions[store_id], 'before_flush', _assign_order_ids)
+
+    @staticmethod
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.execute('''PRAGMA foreign_keys = ON;''')
+
+    @property
+    def store_ids(self):
+        return sorted(self.paths)
+
+    def session(self, store_id):
+        return self._sessions[store_id]()
+
+    def _map(self, sql, parameters):
+        store_ids = self.store_ids
+        if self.workers == 0:
+            return [_query(self.paths[store_id], sql, parameters) for store_id in store_ids]
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers or len(store_ids))
+        return list(self._executor.map(_query, [self.paths[store_id] for store_id in store_ids],
+                                       [sql] * len(store_ids), [parameters] * len(store_ids)))
+
+    def scatter(self, statement):
+        """Run statement on every shard, concurrently unless workers is 0,
+        and return {store_id: rows} with the raw DBAPI values."""
+        dialect = sqlite.dialect()
+        # IN () lists are expanded into one parameter per value here, since
+        # the workers run the SQL string on plain sqlite3 connections
+        compiled = statement.compile(dialect=dialect,
+                                     compile_kwargs={'render_postcompile': True})
+        parameters = compiled.construct_params()
+        positional = []
+        for name in compiled.positiontup:
+            # the types' own bind processors, e.g. Date to its ISO string
+            process = compiled.binds[name].type.bind_processor(dialect)
+            positional.append(process(parameters[name]) if process else parameters[name])
+        return dict(zip(self.store_ids, self._map(str(compiled), positional)))
+
+    def scatter_gather(self, statement, keys=1):
+        """Run an aggregate statement on every shard and merge the results:
+        rows with the same first keys columns are combined by summing the
+        remaining ones."""
+        return _merge(self.scatter(statement).values(), keys)
+
+    def dispose(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for engine in self.engines.values():
+            engine.dispose()
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+
+
+def build_shards(directory=None, bulk=True, batch_size=DEFAULT_BATCH_SIZE, data_dir=None,
+                 template=False, cache_dir=None, workers=None):
+    """Populate the database and split it into one file per store in
+    directory (a temporary directory, removed by dispose(), if not given)."""
+    load_options = dict(bulk=bulk, batch_size=batch_size, workers=None, data_dir=data_dir)
+    if template:
+        source = clone_template(cache_dir=cache_dir, **load_options)
+    else:
+        source = _fresh_connection(load_options, cache_dir)
+    owns_directory = directory is None
+    if owns_directory:
+        directory = tempfile.mkdtemp(prefix='shards-')
+    paths = {}
+    try:
+        store_ids = [store_id for (store_id,) in source.execute('SELECT store_id FROM store')]
+        last_id = source.execute('SELECT max(order_id) FROM "order"').fetchone()[0] or 0
+        if last_id >= order_id_range(min(store_ids))[0]:
+            raise ValueError('order id %d overlaps the order ids reserved for new orders'
+                             % last_id)
+        for store_id in store_ids:
+            paths[store_id] = os.path.join(directory, 'store-%d.sqlite' % store_id)
+            shard = sqlite3.connect(paths[store_id])
+            try:
+                source.backup(shard)
+                # delete children before parents
+                for table in ('order_item', 'order', 'stock'):
+                    shard.execute('DELETE FROM "%s" WHERE NOT (%s)' % (table, SHARDED[table]),
+                                  {'store_id': store_id})
+                shard.commit()
+                shard.execute('VACUUM')
+                shard.execute('''PRAGMA journal_mode = WAL;''')
+            finally:
+                shard.close()
+    except BaseException:
+        if owns_directory:
+            shutil.rmtree(directory, ignore_errors=True)
+        raise
+    finally:
+        source.close()
+    return ShardSet(paths, directory if owns_directory else None, workers)
+
+
+def _revenue():
+    return func.sum(Order_Item.quantity * Order_Item.list_price * (1 - Order_Item.discount))
+
+
+def revenue_by_month(shards):
+    """(month, orders, units, revenue) over every store."""
+    month = func.strftime('%Y-%m', Order.order_date)
+    return shards.scatter_gather(select(month, func.count(Order_Item.order_id.distinct()),
+                                        func.sum(Order_Item.quantity), _revenue())
+                                 .join(Order_Item, Order_Item.order_id == Order.order_id)
+                                 .group_by(month))
+
+
+def units_by_product(shards):
+    """(product_id, units sold, revenue) over every store."""
+    return shards.scatter_gather(select(Order_Item.product_id, func.sum(Order_Item.quantity),
+                                        _revenue())
+                                 .group_by(Order_Item.product_id))
+
+
+def stock_by_product(shards):
+    """(product_id, units in stock) over every store."""
+    return shards.scatter_gather(select(Stock.product_id, func.sum(Stock.quantity))
+                                 .group_by(Stock.product_id))
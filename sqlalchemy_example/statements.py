@@ -0,0 +1,133 @@
+import threading
+from collections import namedtuple
+
+from sqlalchemy import bindparam, event, func, lambda_stmt, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+
+from sqlalchemy_example.models import Customer, Product
+
+STATEMENT_OPTION = 'registry_statement'
+
+# misses count executions that compiled the statement; other counts those
+# that could not use the compiled cache at all, e.g. with caching disabled
+CacheStats = namedtuple('CacheStats', ['executions', 'hits', 'misses', 'other'])
+
+_listening = False
+_listen_lock = threading.Lock()
+
+
+class StatementRegistry(object):
+    """Named statements built once and executed with bound parameters.
+
+    Each statement is a lambda_stmt(), so after its first use neither the
+    Python construction nor the SQL compilation is repeated: the lambda's
+    cache key is derived from its code location and the compiled form comes
+    from the engine's compiled cache. Every execution through the registry
+    is counted as a hit or miss of that cache.
+    """
+
+    def __init__(self):
+        self._statements = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, build):
+        """Register the statement returned by build() under name. Values
+        that vary between calls must be bindparam()s, not Python literals."""
+        if name in self._statements:
+            raise KeyError('statement %r is already registered' % name)
+        self._statements[name] = lambda_stmt(build)
+        self._counts[name] = [0, 0, 0]
+        return self._statements[name]
+
+    def names(self):
+        return sorted(self._statements)
+
+    def statement(self, name):
+        return self._statements[name]
+
+    def execute(self, session, name, **parameters):
+        """Execute the named statement on session with the given parameters
+        and return the Result."""
+        if not _listening:
+            _listen()
+        return session.execute(self._statements[name], parameters,
+                               execution_options={STATEMENT_OPTION: (self, name)})
+
+    def _record(self, name, cache_hit):
+        index = 0 if cache_hit is CACHE_HIT else 1 if cache_hit is CACHE_MISS else 2
+        with self._lock:
+            self._counts[name][index] += 1
+
+    def stats(self):
+        """Return CacheStats for every registered statement, keyed by name."""
+        with self._lock:
+            return {name: CacheStats(sum(counts), *counts) for name, counts in self._counts.items()}
+
+    def hit_ratio(self):
+        stats = self.stats().values()
+        executions = sum(stat.executions for stat in stats)
+        return sum(stat.hits for stat in stats) / executions if executions else 0.0
+
+    def reset(self):
+        with self._lock:
+            for counts in self._counts.values():
+                counts[:] = [0, 0, 0]
+
+
+def _listen():
+    # a single listener on every engine serves all registries; statements
+    # are attributed to a registry through their execution options
+    global _listening
+    with _listen_lock:
+        if not _listening:
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            _listening = True
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    tag = context.execution_options.get(STATEMENT_OPTION)
+    if tag is not None:
+        registry, name = tag
+        registry._record(name, context.cache_hit)
+
+
+def _city_counts():
+    return select(Customer.city, func.count(Customer.city).label('city_count')) \
+        .where(Customer.state == bindparam('state')) \
+        .group_by(Customer.city)
+
+
+def _cities_with_more_customers_than():
+    city_count = _city_counts().subquery()
+    return select(city_count) \
+        .where(city_count.c.city_count > bindparam('min_count')) \
+        .order_by(city_count.c.city)
+
+
+registry = StatementRegistry()
+
+registry.register('customers_by_state', lambda: select(Customer)
+                  .where(Customer.state == bindparam('state'))
+                  .order_by(Customer.last_name, Customer.customer_id))
+
+registry.register('customer_names_by_state', lambda: select(Customer.first_name,
+                                                            Customer.last_name)
+                  .where(Customer.state == bindparam('state'))
+                  .order_by(Customer.last_name))
+
+registry.register('products_by_category_and_year', lambda: select(Product)
+                  .where(Product.category_id == bindparam('category_id'))
+                  .where(Product.model_year == bindparam('model_year'))
+                  .order_by(Product.product_id))
+
+registry.register('city_counts', lambda: _city_counts().order_by(Customer.city))
+
+registry.register('cities_with_more_customers_than', _cities_with_more_customers_than)
+
+
+def execute(session, name, **parameters):
+    """Execute a statement of the default registry, e.g.
+    execute(session, 'city_counts', state='CA')."""
+    return registry.execute(session, name, **parameters)
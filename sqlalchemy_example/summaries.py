@@ -0,0 +1,220 @@
+import argparse
+import sys
+from collections import namedtuple
+from itertools import chain, zip_longest
+
+from sqlalchemy import (Column, Date, Float, Integer, String, Table, create_engine, event, func,
+                        inspect, or_, select, tuple_)
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from sqlalchemy_example.iteration import chunked
+from sqlalchemy_example.models import Order, Order_Item, Product, feature_metadata
+
+store_day_sales = Table('store_day_sales', feature_metadata,
+                        Column('store_id', Integer, primary_key=True),
+                        Column('order_date', Date, primary_key=True),
+                        Column('revenue', Float, nullable=False),
+                        Column('units', Integer, nullable=False))
+
+product_month_sales = Table('product_month_sales', feature_metadata,
+                            Column('product_id', Integer, primary_key=True),
+                            Column('month', String(7), primary_key=True),
+                            Column('revenue', Float, nullable=False),
+                            Column('units', Integer, nullable=False))
+
+brand_category_sales = Table('brand_category_sales', feature_metadata,
+                             Column('brand_id', Integer, primary_key=True),
+                             Column('category_id', Integer, primary_key=True),
+                             Column('revenue', Float, nullable=False),
+                             Column('units', Integer, nullable=False))
+
+SUMMARIES = (store_day_sales, product_month_sales, brand_category_sales)
+
+# revenue is summed in a different order by the deltas than by a rebuild, so
+# the two only agree to within floating point error
+TOLERANCE = 1e-6
+
+PENDING = 'summaries_pending'
+
+Mismatch = namedtuple('Mismatch', ['table', 'key', 'expected', 'actual'])
+
+
+def _contributions():
+    # one row per order item with every key it is summarised under
+    revenue = Order_Item.quantity * Order_Item.list_price * (1 - Order_Item.discount)
+    return select(Order_Item.order_id, Order_Item.item_id,
+                  Order.store_id, Order.order_date,
+                  Order_Item.product_id, func.strftime('%Y-%m', Order.order_date).label('month'),
+                  Product.brand_id, Product.category_id,
+                  revenue.label('revenue'), Order_Item.quantity.label('units')) \
+        .join(Order, Order.order_id == Order_Item.order_id) \
+        .join(Product, Product.product_id == Order_Item.product_id)
+
+
+def _keys(table):
+    return [column.name for column in table.primary_key]
+
+
+def _aggregates():
+    contributions = _contributions().subquery()
+    return {table: select(*[contributions.c[name] for name in _keys(table)],
+                          func.sum(contributions.c.revenue), func.sum(contributions.c.units))
+                   .group_by(*[contributions.c[name] for name in _keys(table)])
+            for table in SUMMARIES}
+
+
+def create_summaries(connection):
+    feature_metadata.create_all(connection, tables=SUMMARIES)
+
+
+def rebuild_summaries(session):
+    """Recompute every summary table from order_item, order and product. This
+    is needed after changes made with Core statements, which bypass the
+    session events that maintain the summaries incrementally."""
+    for table, aggregate in _aggregates().items():
+        session.execute(table.delete())
+        session.execute(table.insert().from_select(_keys(table) + ['revenue', 'units'],
+                                                   aggregate))
+
+
+def check_summaries(session, tolerance=TOLERANCE):
+    """Compare every summary table against a full aggregation and return a
+    Mismatch for each group whose revenue or units differ."""
+    mismatches = []
+    for table, aggregate in _aggregates().items():
+        size = len(table.primary_key)
+        expected = {tuple(row[:size]): tuple(row[size:]) for row in session.execute(aggregate)}
+        actual = {tuple(row[:size]): tuple(row[size:]) for row in session.execute(table.select())}
+        for key in sorted(set(expected) | set(actual)):
+            want, got = expected.get(key), actual.get(key)
+            if want is None or got is None or want[1] != got[1] \
+                    or abs(want[0] - got[0]) > tolerance * max(1.0, abs(want[0])):
+                mismatches.append(Mismatch(table.name, key, want, got))
+    return mismatches
+
+
+def _changed(instance, *names):
+    state = inspect(instance)
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+
+def _fetch(session, item_keys, order_ids, product_ids):
+    # the contribution of every affected item, keyed by item so that one hit
+    # by several changes (say its quantity and its order's date) counts once
+    rows = {}
+    for item_chunk, order_chunk, product_chunk in zip_longest(
+            chunked(item_keys), chunked(order_ids), chunked(product_ids), fillvalue=[]):
+        criteria = [criterion for criterion, values in (
+            (tuple_(Order_Item.order_id, Order_Item.item_id).in_(item_chunk), item_chunk),
+            (Order_Item.order_id.in_(order_chunk), order_chunk),
+            (Order_Item.product_id.in_(product_chunk), product_chunk))
+            if values]
+        for row in session.execute(_contributions().where(or_(*criteria))):
+            rows[(row.order_id, row.item_id)] = row
+    return rows.values()
+
+
+def _accumulate(deltas, rows, sign):
+    for row in rows:
+        for table in SUMMARIES:
+            key = tuple(row._mapping[name] for name in _keys(table))
+            delta = deltas[table].setdefault(key, [0.0, 0])
+            delta[0] += sign * row.revenue
+            delta[1] += sign * row.units
+
+
+def _before_flush(session, flush_context, instances):
+    items, orders, products = [], [], []
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, Order_Item):
+            items.append(instance)
+        elif isinstance(instance, Order) and _changed(instance, 'order_id', 'store_id',
+                                                      'order_date'):
+            orders.append(instance)
+        elif isinstance(instance, Product) and _changed(instance, 'product_id', 'brand_id',
+                                                        'category_id'):
+            products.append(instance)
+    if not (items or orders or products):
+        return
+    # the database still holds the state from before this flush, so read
+    # what the affected items contributed then
+    persistent = [inspect(instance) for instance in chain(items, orders, products)
+                  if inspect(instance).identity is not None]
+    old = _fetch(session,
+                 [state.identity for state in persistent if state.class_ is Order_Item],
+                 [state.identity[0] for state in persistent if state.class_ is Order],
+                 [state.identity[0] for state in persistent if state.class_ is Product])
+    session.info[PENDING] = (items, orders, products, old)
+
+
+def _after_flush(session, flush_context):
+    pending = session.info.pop(PENDING, None)
+    if pending is None:
+        return
+    items, orders, products, old = pending
+    deleted = set(session.deleted)
+    new = _fetch(session,
+                 [(item.order_id, item.item_id) for item in items if item not in deleted],
+                 [order.order_id for order in orders if order not in deleted],
+                 [product.product_id for product in products if product not in deleted])
+    deltas = {table: {} for table in SUMMARIES}
+    _accumulate(deltas, old, -1)
+    _accumulate(deltas, new, 1)
+    for table in SUMMARIES:
+        names = _keys(table)
+        parameters = [dict(zip(names, key), revenue=revenue, units=units)
+                      for key, (revenue, units) in deltas[table].items()
+                      if revenue or units]
+        if not parameters:
+            continue
+        statement = insert(table)
+        session.execute(statement.on_conflict_do_update(
+            index_elements=names,
+            set_={'revenue': table.c.revenue + statement.excluded.revenue,
+                  'units': table.c.units + statement.excluded.units}), parameters)
+        session.execute(table.delete().where(table.c.units == 0))
+
+
+def enable_summaries(session):
+    """Create and populate the summary tables, commit, and keep them up to
+    date from then on: every flush of session that inserts, updates or
+    deletes Order_Item rows, or moves orders or products between the keys
+    they are summarised under, applies the difference to the summaries in
+    the same transaction."""
+    create_summaries(session.connection())
+    rebuild_summaries(session)
+    session.commit()
+    if not event.contains(session, 'before_flush', _before_flush):
+        event.listen(session, 'before_flush', _before_flush)
+        event.listen(session, 'after_flush', _after_flush)
+    return session
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sqlalchemy_example.summaries',
+                                     description='Rebuild or check the sales summary tables '
+                                                 'of a SQLite database file.')
+    parser.add_argument('database')
+    parser.add_argument('--check', action='store_true',
+                        help='report summary groups that are out of date instead of rebuilding')
+    args = parser.parse_args(argv)
+    engine = create_engine('sqlite:///' + args.database)
+    session = Session(bind=engine)
+    try:
+        if args.check:
+            mismatches = check_summaries(session)
+            for mismatch in mismatches:
+                print('%s %r: expected %r, found %r' % mismatch)
+            return 1 if mismatches else 0
+        create_summaries(session.connection())
+        rebuild_summaries(session)
+        session.commit()
+        return 0
+    finally:
+        session.close()
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import unittest
+
+from sqlalchemy import func
+
+from sqlalchemy_example.advisor import IndexAdvisor, suggest_index
+from sqlalchemy_example.create_session import *
+
+class TestIndexAdvisor(unittest.TestCase):
+
+    def setUp(self):
+        self.session = build_session(template=True)
+        self.advisor = IndexAdvisor(min_rows=1000)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_indexed_filters_are_not_flagged(self):
+        with self.advisor.capture(self.session.get_bind()):
+            self.session.query(Customer.city).filter_by(state = 'CA').all()
+            self.session.query(Order).filter_by(customer_id = 259).all()
+            self.session.query(Order_Item).filter_by(product_id = 20).all()
+        self.assertEqual(len(self.advisor.plans), 3)
+        self.assertEqual(self.advisor.advice(), [])
+
+    def test_full_scan_of_large_table_is_flagged(self):
+        with self.advisor.capture(self.session.get_bind()):
+            self.session.query(Customer.first_name) \
+                        .filter(Customer.last_name == 'Burks') \
+                        .all()
+        advice, = self.advisor.advice()
+        self.assertEqual((advice.table, advice.rows), ('customer', 1445))
+        self.assertEqual(advice.suggestion,
+            'CREATE INDEX ix_customer_last_name_first_name ON "customer" (last_name, first_name)')
+
+    def test_small_tables_are_ignored(self):
+        with self.advisor.capture(self.session.get_bind()):
+            self.session.query(Brand).filter_by(brand_name = 'Trek').all()
+        self.assertEqual(self.advisor.advice(), [])
+
+    def test_statements_outside_capture_are_not_recorded(self):
+        with self.advisor.capture(self.session.get_bind()):
+            pass
+        self.session.query(Customer).filter(Customer.last_name == 'Burks').all()
+        self.assertEqual(self.advisor.plans, {})
+
+    def test_subquery_scans_are_not_counted(self):
+        with self.advisor.capture(self.session.get_bind()):
+            city_count = self.session.query(Customer.city,
+                                            func.count(Customer.city).label('city_count')) \
+                                     .filter_by(state = 'CA') \
+                                     .group_by(Customer.city) \
+                                     .subquery()
+            results = self.session.query(city_count) \
+                                  .filter(city_count.c.city_count > 10) \
+                                  .all()
+        self.assertEqual(len(results), 5)
+        self.assertEqual(len(self.advisor.plans), 1)
+        self.assertEqual(self.advisor.advice(), [])
+
+    def test_suggestion_skips_wide_covering_columns(self):
+        statement = 'SELECT "order".order_id, "order".customer_id, "order".order_status, ' \
+                    '"order".order_date, "order".store_id FROM "order" ' \
+                    'WHERE "order".shipped_date IS NULL'
+        self.assertEqual(suggest_index(statement, 'order'),
+            'CREATE INDEX ix_order_shipped_date ON "order" (shipped_date)')
@@ -0,0 +1,110 @@
+import unittest
+from collections import defaultdict
+
+from sqlalchemy import func
+
+from sqlalchemy_example.create_session import *
+
+try:
+    import numpy
+    from sqlalchemy_example import analytics
+except ImportError:
+    analytics = None
+
+@unittest.skipIf(analytics is None, 'numpy is not installed')
+class TestAnalytics(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.session = build_session(template=True)
+        cls.extract = analytics.extract(cls.session)
+
+    def setUp(self):
+        self.session.expunge_all()
+
+    def test_revenue_matches_sql(self):
+        revenue = Order_Item.quantity * Order_Item.list_price * (1 - Order_Item.discount)
+        expected = dict(self.session.query(Order.store_id, func.sum(revenue))
+                                    .join(Order_Item)
+                                    .group_by(Order.store_id))
+        grouped = analytics.revenue(self.extract, 'store_id')
+        self.assertEqual(grouped.keys.tolist(), sorted(expected))
+        for store_id, total in zip(grouped.keys.tolist(), grouped.values):
+            self.assertAlmostEqual(total, expected[store_id], places=4)
+        self.assertAlmostEqual(analytics.revenue(self.extract), sum(expected.values()), places=4)
+
+    def test_revenue_by_month(self):
+        grouped = analytics.revenue(self.extract, 'month')
+        self.assertEqual(str(grouped.keys[0]), '2016-01')
+        self.assertAlmostEqual(grouped.values.sum(), analytics.revenue(self.extract), places=4)
+
+    def test_discount_impact(self):
+        impact = analytics.discount_impact(self.extract, 'brand_id')
+        self.assertEqual(len(impact.keys), 9)
+        for gross, discount, net in zip(impact.gross, impact.discount, impact.net):
+            self.assertAlmostEqual(gross - discount, net)
+        self.assertAlmostEqual(impact.net.sum(), analytics.revenue(self.extract), places=4)
+        self.assertTrue(((impact.rate > 0) & (impact.rate < 0.2)).all())
+
+    def test_basket_sizes(self):
+        baskets = analytics.basket_sizes(self.extract)
+        order = self.session.query(Order).get(1)
+        index = baskets.order_ids.tolist().index(1)
+        self.assertEqual(baskets.items[index], len(order.order_item))
+        self.assertEqual(baskets.units[index], sum(item.quantity for item in order.order_item))
+        self.assertEqual(baskets.items.sum(), 4722)
+
+    def test_stock_turnover(self):
+        turnover = analytics.stock_turnover(self.extract)
+        in_stock = dict(self.session.query(Stock.store_id, func.sum(Stock.quantity))
+                                    .group_by(Stock.store_id))
+        self.assertEqual(dict(zip(turnover.store_ids.tolist(), turnover.in_stock.tolist())),
+                         in_stock)
+        self.assertEqual(turnover.sold.sum(), self.session.query(func.sum(Order_Item.quantity))
+                                                          .scalar())
+        for sold, stock, ratio in zip(turnover.sold, turnover.in_stock, turnover.turnover):
+            self.assertAlmostEqual(ratio, sold / stock)
+
+    def test_shipping_lateness(self):
+        late = defaultdict(int)
+        shipped = defaultdict(int)
+        for order in self.session.query(Order).filter(Order.shipped_date != None):
+            shipped[order.store_id] += 1
+            if order.shipped_date > order.required_date:
+                late[order.store_id] += 1
+        lateness = analytics.shipping_lateness(self.extract)
+        self.assertEqual(dict(zip(lateness.store_ids.tolist(), lateness.shipped.tolist())),
+                         dict(shipped))
+        self.assertEqual(dict(zip(lateness.store_ids.tolist(), lateness.late.tolist())),
+                         dict(late))
+        order_ids, days = analytics.order_lateness(self.extract)
+        self.assertEqual(int(numpy.isnan(days).sum()),
+                         self.session.query(Order).filter(Order.shipped_date == None).count())
+
+
+@unittest.skipIf(analytics is None, 'numpy is not installed')
+class TestExtractCache(unittest.TestCase):
+
+    def setUp(self):
+        self.session = build_session(template=True)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_cached_extract_is_reused(self):
+        self.assertIs(analytics.extract(self.session, cache=True),
+                      analytics.extract(self.session, cache=True))
+        self.assertIsNot(analytics.extract(self.session), analytics.extract(self.session))
+
+    def test_flush_invalidates_cache(self):
+        cached = analytics.extract(self.session, cache=True)
+        self.session.query(Order_Item).get((1, 1)).quantity += 1
+        self.session.flush()
+        fresh = analytics.extract(self.session, cache=True)
+        self.assertIsNot(fresh, cached)
+        self.assertEqual(fresh.items['quantity'].sum(), cached.items['quantity'].sum() + 1)
+
+    def test_core_writes_invalidate_cache(self):
+        cached = analytics.extract(self.session, cache=True)
+        self.session.execute(Order_Item.__table__.delete().where(Order_Item.order_id == 1))
+        self.assertIsNot(analytics.extract(self.session, cache=True), cached)
@@ -0,0 +1,50 @@
+import unittest
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from sqlalchemy_example.async_session import build_async_session, close_async_session
+from sqlalchemy_example.create_session import *
+
+class TestAsyncSession(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.session = await build_async_session()
+
+    async def asyncTearDown(self):
+        await close_async_session(self.session)
+
+    async def count(self, model):
+        result = await self.session.execute(select(func.count()).select_from(model))
+        return result.scalar()
+
+    async def test_every_table_is_loaded(self):
+        for model, expected in [(Brand, 9), (Category, 7), (Customer, 1445), (Order, 1615),
+                                (Order_Item, 4722)]:
+            self.assertEqual(await self.count(model), expected)
+
+    async def test_relationships_are_eagerly_loaded(self):
+        result = await self.session.execute(select(Order).where(Order.order_id == 1))
+        order = result.scalars().one()
+        self.assertEqual(order.customer.last_name, 'Velazquez')
+        self.assertEqual(len(order.order_item), 5)
+        self.assertEqual(order.order_item[0].product.brand.brand_name, 'Electra')
+
+    async def test_foreign_keys_are_enforced(self):
+        self.session.add(Product(product_name='Unknown', brand_id=999, category_id=1,
+                                 model_year=2018, list_price=1))
+        with self.assertRaises(IntegrityError):
+            await self.session.commit()
+        await self.session.rollback()
+
+
+class TestAsyncOrmLoading(unittest.IsolatedAsyncioTestCase):
+
+    async def test_orm_loading_matches_bulk_loading(self):
+        session = await build_async_session(bulk=False, batch_size=250, profile=None)
+        try:
+            result = await session.execute(select(func.count()).select_from(Customer))
+            self.assertEqual(result.scalar(), 1445)
+            self.assertEqual(len(session.identity_map), 0)
+        finally:
+            await close_async_session(session)
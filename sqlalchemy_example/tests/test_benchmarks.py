@@ -0,0 +1,28 @@
+import unittest
+
+from sqlalchemy_example.benchmarks import compare, measure
+
+class TestCompare(unittest.TestCase):
+
+    def results(self, median):
+        return {'results': {'1': {'query.outer_join': {'median': median}}}}
+
+    def test_slowdown_within_tolerance_passes(self):
+        self.assertEqual(compare(self.results(1.2), self.results(1.0), tolerance=0.25), [])
+
+    def test_slowdown_beyond_tolerance_is_reported(self):
+        self.assertEqual(compare(self.results(1.5), self.results(1.0), tolerance=0.25),
+                         [('1', 'query.outer_join', 1.0, 1.5)])
+
+    def test_metrics_missing_from_baseline_are_ignored(self):
+        self.assertEqual(compare(self.results(1.5), {'results': {}}), [])
+
+
+class TestMeasure(unittest.TestCase):
+
+    def test_setup_runs_before_every_call(self):
+        calls = []
+        stats = measure(lambda: calls.append('run'), repeat=3,
+                        setup=lambda: calls.append('setup'))
+        self.assertEqual(calls, ['setup', 'run'] * 3)
+        self.assertLessEqual(stats['min'], stats['median'])
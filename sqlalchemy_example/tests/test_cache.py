@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import sqlalchemy
+
+from sqlalchemy_example import load_data
+from sqlalchemy_example.cache import cache_path, dataset_hash
+from sqlalchemy_example.create_session import *
+
+class TestDatasetCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def test_first_build_writes_cache_file(self):
+        session = build_session(bulk=True, cache_dir=self.cache_dir)
+        self.assertEqual(session.query(Customer).count(), 1445)
+        self.assertTrue(os.path.exists(cache_path(self.cache_dir)))
+
+    def test_warm_start_reads_cache_instead_of_loading(self):
+        build_session(bulk=True, cache_dir=self.cache_dir).close()
+        with mock.patch('sqlalchemy_example.create_session.load_all') as loader:
+            session = build_session(cache_dir=self.cache_dir)
+        loader.assert_not_called()
+        self.assertEqual(session.query(Order_Item).count(), 4722)
+
+    def test_in_memory_copy_does_not_modify_cache(self):
+        session = build_session(bulk=True, cache_dir=self.cache_dir)
+        session.query(Order_Item).delete()
+        session.commit()
+        session = build_session(cache_dir=self.cache_dir)
+        self.assertEqual(session.query(Order_Item).count(), 4722)
+
+    def test_file_backed_session_is_read_only(self):
+        session = build_session(bulk=True, cache_dir=self.cache_dir, in_memory=False)
+        self.assertEqual(session.query(Brand).count(), 9)
+        session.add(Brand(brand_id=10, brand_name='test'))
+        self.assertRaises(sqlalchemy.exc.OperationalError, session.commit)
+
+    def test_changed_csv_invalidates_cache(self):
+        data_dir = os.path.join(self.cache_dir, 'data')
+        shutil.copytree(load_data.DATA_DIR, data_dir)
+        with mock.patch.object(load_data, 'DATA_DIR', data_dir):
+            build_session(bulk=True, cache_dir=self.cache_dir).close()
+            original = cache_path(self.cache_dir)
+            with open(os.path.join(data_dir, 'stocks.csv'), 'a') as datafile:
+                datafile.write('3,999,1\n')
+            self.assertNotEqual(cache_path(self.cache_dir), original)
+            session = build_session(bulk=True, cache_dir=self.cache_dir)
+        self.assertEqual(session.query(Stock).count(), 940)
+        self.assertFalse(os.path.exists(original))
+
+    def test_changed_metadata_changes_hash(self):
+        original = dataset_hash()
+        index = sqlalchemy.Index('ix_brand_test', Brand.brand_name)
+        try:
+            self.assertNotEqual(dataset_hash(), original)
+        finally:
+            Brand.__table__.indexes.discard(index)
+        self.assertEqual(dataset_hash(), original)
+
+    def test_other_data_dir_caches_are_kept(self):
+        data_dir = os.path.join(self.cache_dir, 'data')
+        shutil.copytree(load_data.DATA_DIR, data_dir)
+        with open(os.path.join(data_dir, 'stocks.csv'), 'a') as datafile:
+            datafile.write('3,999,1\n')
+        build_session(bulk=True, cache_dir=self.cache_dir).close()
+        build_session(bulk=True, cache_dir=self.cache_dir, data_dir=data_dir).close()
+        self.assertTrue(os.path.exists(cache_path(self.cache_dir)))
+        self.assertTrue(os.path.exists(cache_path(self.cache_dir, data_dir)))
+
+    def test_prune_ignores_files_already_removed(self):
+        stale = cache_path(self.cache_dir)[:-len('.sqlite')] + 'stale.sqlite'
+        open(stale, 'w').close()
+        with mock.patch('os.remove', side_effect=FileNotFoundError):
+            session = build_session(bulk=True, cache_dir=self.cache_dir)
+        self.assertEqual(session.query(Brand).count(), 9)
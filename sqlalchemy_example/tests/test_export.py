@@ -0,0 +1,159 @@
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import func, select
+
+from sqlalchemy_example.create_session import *
+from sqlalchemy_example import export
+from sqlalchemy_example.load_data import SOURCES
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class TestExport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.session = build_session(template=True)
+
+    def setUp(self):
+        self.session.expunge_all()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_csv_round_trip(self):
+        export.export_all(self.session, self.directory.name, chunk_size=100)
+        session = build_session(data_dir=self.directory.name)
+        for model in (Customer, Product, Order, Order_Item, Stock):
+            self.assertEqual(session.query(model).count(), self.session.query(model).count())
+        self.assertEqual(session.query(Customer).get(5).email,
+                         self.session.query(Customer).get(5).email)
+        order = session.query(Order).get(1615)
+        expected = self.session.query(Order).get(1615)
+        self.assertEqual((order.order_date, order.shipped_date, order.customer_id),
+                         (expected.order_date, expected.shipped_date, expected.customer_id))
+
+    def test_csv_refuses_ids_it_cannot_reload(self):
+        self.session.add(Customer(customer_id=5000, first_name='A', last_name='B',
+                                  email='a.b@example.com'))
+        self.session.flush()
+        directory = os.path.join(self.directory.name, 'export')
+        with self.assertRaises(ValueError):
+            export.export_all(self.session, directory)
+        self.assertFalse(os.path.exists(directory))
+        self.session.rollback()
+        self.session.query(Order).filter_by(customer_id=1).update({'customer_id': 2})
+        self.session.query(Customer).filter_by(customer_id=1).delete()
+        with self.assertRaises(ValueError):
+            export.export_table_csv(self.session, 'customer',
+                                    os.path.join(self.directory.name, 'customers.csv'))
+        self.session.rollback()
+
+    def test_csv_of_any_statement(self):
+        path = os.path.join(self.directory.name, 'lines.csv')
+        export.export_csv(self.session, export.order_lines(), path, chunk_size=1000)
+        with open(path) as datafile:
+            lines = datafile.read().splitlines()
+        self.assertEqual(len(lines), self.session.query(Order_Item).count())
+        self.assertEqual(lines[0].split(',')[:3], ['1', '1', '20160101'])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            export.export_all(self.session, self.directory.name, format='xlsx')
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class TestColumnarExport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.session = build_session(template=True)
+
+    def setUp(self):
+        self.session.expunge_all()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_schema_follows_columns(self):
+        schema = export.arrow_schema(export.table_statement('order'))
+        self.assertEqual(schema.field('order_id').type, pyarrow.int64())
+        self.assertFalse(schema.field('order_id').nullable)
+        self.assertEqual(schema.field('shipped_date').type, pyarrow.date32())
+        self.assertTrue(schema.field('shipped_date').nullable)
+        schema = export.arrow_schema(export.order_lines())
+        self.assertEqual(schema.field('product_name').type, pyarrow.string())
+        self.assertEqual(schema.field('revenue').type, pyarrow.float64())
+
+    def test_outer_joined_columns_are_nullable(self):
+        statement = select(Product.product_id, Product.product_name, Order_Item.order_id,
+                           Order_Item.quantity) \
+            .outerjoin(Order_Item, Order_Item.product_id == Product.product_id) \
+            .order_by(Product.product_id, Order_Item.order_id)
+        schema = export.arrow_schema(statement)
+        self.assertEqual([field.nullable for field in schema], [False, False, True, True])
+        expected = self.session.execute(select(func.count()).select_from(statement.subquery())) \
+                               .scalar()
+        path = os.path.join(self.directory.name, 'products.parquet')
+        export.export_parquet(self.session, statement, path, chunk_size=1000)
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(table.num_rows, expected)
+        self.assertEqual(table.column('order_id').null_count, 14)
+        path = os.path.join(self.directory.name, 'products.arrow')
+        export.export_arrow(self.session, statement, path, chunk_size=1000)
+        table = pyarrow.ipc.open_file(path).read_all()
+        self.assertTrue(table.schema.field('quantity').nullable)
+        self.assertEqual(table.column('quantity').null_count, 14)
+
+    def test_aggregates_and_functions(self):
+        year = func.strftime('%Y', Order.order_date)
+        statement = select(year, func.count(Order.order_id),
+                           func.julianday(func.max(Order.order_date))) \
+            .group_by(year) \
+            .order_by(year)
+        path = os.path.join(self.directory.name, 'years.parquet')
+        export.export_parquet(self.session, statement, path)
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(table.column_names, ['strftime', 'count', 'julianday'])
+        self.assertEqual([field.type for field in table.schema],
+                         [pyarrow.string(), pyarrow.int64(), pyarrow.float64()])
+        self.assertEqual(table.column('strftime').to_pylist(), ['2016', '2017', '2018'])
+        self.assertEqual(sum(table.column('count').to_pylist()),
+                         self.session.query(Order).count())
+
+    def test_empty_result(self):
+        statement = select(func.strftime('%Y', Order.order_date)).where(Order.order_id < 0)
+        path = os.path.join(self.directory.name, 'empty.arrow')
+        export.export_arrow(self.session, statement, path)
+        table = pyarrow.ipc.open_file(path).read_all()
+        self.assertEqual((table.num_rows, table.schema.field(0).type), (0, pyarrow.string()))
+
+    def test_parquet_row_groups(self):
+        path = os.path.join(self.directory.name, 'lines.parquet')
+        export.export_parquet(self.session, export.order_lines(), path, chunk_size=1000)
+        parquet = pyarrow.parquet.ParquetFile(path)
+        count = self.session.query(Order_Item).count()
+        self.assertEqual(parquet.metadata.num_rows, count)
+        self.assertEqual(parquet.metadata.num_row_groups, -(-count // 1000))
+
+    def test_export_all(self):
+        for format in ('parquet', 'arrow'):
+            paths = export.export_all(self.session, self.directory.name, format=format)
+            self.assertEqual(set(paths), set(SOURCES))
+            if format == 'parquet':
+                table = pyarrow.parquet.read_table(paths['order'])
+            else:
+                table = pyarrow.ipc.open_file(paths['order']).read_all()
+            self.assertEqual(table.num_rows, self.session.query(Order).count())
+            order = self.session.query(Order).get(1)
+            self.assertEqual(table.column('order_date')[0].as_py(), order.order_date)
+            self.assertEqual(table.column('shipped_date').null_count,
+                             self.session.query(Order).filter(Order.shipped_date.is_(None)).count())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+from itertools import islice
+
+from sqlalchemy_example.benchmarks.queries import QUERIES
+from sqlalchemy_example.create_session import *
+from sqlalchemy_example.generate import generate_rows, load_generated, write_data_dir
+
+class TestGenerateRows(unittest.TestCase):
+
+    def test_output_is_deterministic_for_a_seed(self):
+        for table in ('customer', 'order', 'order_item', 'stock'):
+            first = list(islice(generate_rows(table, scale=2, seed=7), 200))
+            second = list(islice(generate_rows(table, scale=2, seed=7), 200))
+            self.assertEqual(first, second)
+
+    def test_different_seeds_differ(self):
+        self.assertNotEqual(list(islice(generate_rows('order', seed=1), 50)),
+                            list(islice(generate_rows('order', seed=2), 50)))
+
+    def test_row_counts_follow_scale(self):
+        self.assertEqual(sum(1 for _ in generate_rows('customer', scale=2)), 2 * 1445)
+        self.assertEqual(sum(1 for _ in generate_rows('order', scale=0.5)), 808)
+
+    def test_unshipped_orders_are_not_complete(self):
+        for order in generate_rows('order', scale=1):
+            self.assertEqual(order['shipped_date'] is None, order['order_status'] != 4)
+
+
+class TestGeneratedDatabase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        cls.generated = sessionmaker(bind=engine)()
+        cls.generated.execute('''PRAGMA foreign_keys = ON;''')
+        load_generated(cls.generated, scale=3, seed=1)
+
+    def test_foreign_keys_are_satisfied(self):
+        self.assertEqual(self.generated.execute('''PRAGMA foreign_key_check;''').fetchall(), [])
+        orphans = self.generated.query(Order_Item) \
+                                .outerjoin(Product) \
+                                .filter(Product.product_id.is_(None)) \
+                                .count()
+        self.assertEqual(orphans, 0)
+
+    def test_orders_scale_with_factor(self):
+        self.assertEqual(self.generated.query(Order).count(), 3 * 1615)
+        self.assertEqual(self.generated.query(Customer).count(), 3 * 1445)
+
+    def test_queries_run_on_generated_data(self):
+        for query in QUERIES.values():
+            self.assertTrue(query(self.generated))
+
+
+class TestWriteDataDir(unittest.TestCase):
+
+    def test_written_files_load_with_build_session(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        data_dir = write_data_dir(os.path.join(directory, 'data'), scale=0.5, seed=3)
+        session = build_session(bulk=True, data_dir=data_dir)
+        self.assertEqual(session.query(Order).count(), 808)
+        loaded = [tuple(row) for row in session.query(Order_Item.order_id, Order_Item.item_id,
+                                                      Order_Item.product_id)
+                                               .order_by(Order_Item.order_id, Order_Item.item_id)]
+        generated = [(row['order_id'], row['item_id'], row['product_id'])
+                     for row in generate_rows('order_item', scale=0.5, seed=3)]
+        self.assertEqual(loaded, generated)
+
+    def test_templates_are_kept_per_data_dir(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        data_dir = write_data_dir(os.path.join(directory, 'data'), scale=0.5, seed=3)
+        self.assertEqual(build_session(template=True).query(Order).count(), 1615)
+        self.assertEqual(build_session(template=True, data_dir=data_dir).query(Order).count(), 808)
+        self.assertEqual(build_session(template=True).query(Order).count(), 1615)
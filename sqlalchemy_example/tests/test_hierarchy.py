@@ -0,0 +1,101 @@
+import unittest
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from sqlalchemy_example.create_session import *
+from sqlalchemy_example.hierarchy import (ancestors, depth, descendants, enable_closure,
+                                          rebuild_closure, staff_closure, subtree_orders,
+                                          subtree_sales)
+
+class TestRecursiveHierarchy(unittest.TestCase):
+
+    closure = False
+
+    def setUp(self):
+        self.session = build_session(template=True)
+        if self.closure:
+            enable_closure(self.session)
+
+    def tearDown(self):
+        self.session.close()
+
+    def ids(self, staff):
+        return [member.staff_id for member in staff]
+
+    def test_descendants(self):
+        self.assertEqual(self.ids(descendants(self.session, 5, closure=self.closure)),
+                         [6, 7, 9, 10])
+        self.assertEqual(self.ids(descendants(self.session, 1, closure=self.closure)),
+                         [2, 5, 8, 3, 4, 6, 7, 9, 10])
+        self.assertEqual(self.ids(descendants(self.session, 3, include_self=True,
+                                              closure=self.closure)), [3])
+
+    def test_ancestors(self):
+        self.assertEqual(self.ids(ancestors(self.session, 10, closure=self.closure)), [7, 5, 1])
+        self.assertEqual(self.ids(ancestors(self.session, 1, closure=self.closure)), [])
+
+    def test_depth(self):
+        self.assertEqual(depth(self.session, 1, closure=self.closure), 0)
+        self.assertEqual(depth(self.session, 9, closure=self.closure), 3)
+        self.assertIsNone(depth(self.session, 99, closure=self.closure))
+
+    def test_subtree_orders(self):
+        orders = self.session.execute(subtree_orders(7, closure=self.closure)).scalars().all()
+        self.assertLessEqual({order.staff_id for order in orders}, {7, 9, 10})
+        self.assertEqual(len(orders), self.session.query(Order)
+                                                  .filter(Order.staff_id.in_([7, 9, 10]))
+                                                  .count())
+
+    def test_subtree_sales(self):
+        revenue = Order_Item.quantity * Order_Item.list_price * (1 - Order_Item.discount)
+        expected = self.session.query(func.count(Order.order_id.distinct()),
+                                      func.sum(Order_Item.quantity), func.sum(revenue)) \
+                               .join(Order_Item) \
+                               .filter(Order.staff_id.in_([5, 6, 7, 9, 10])) \
+                               .one()
+        orders, units, total = subtree_sales(self.session, 5, closure=self.closure)
+        self.assertEqual((orders, units), tuple(expected[:2]))
+        self.assertAlmostEqual(total, expected[2], places=4)
+        self.assertEqual(subtree_sales(self.session, 99, closure=self.closure), (0, 0, 0.0))
+
+    def test_reassigned_manager_moves_subtree(self):
+        self.session.query(Staff).get(7).manager_id = 8
+        self.session.flush()
+        self.assertEqual(self.ids(ancestors(self.session, 10, closure=self.closure)), [7, 8, 1])
+        self.assertEqual(self.ids(descendants(self.session, 5, closure=self.closure)), [6])
+        self.assertEqual(self.ids(descendants(self.session, 8, closure=self.closure)), [7, 9, 10])
+
+    def test_new_staff_join_the_hierarchy(self):
+        self.session.add(Staff(staff_id=11, first_name='Ada', last_name='Moss',
+                               email='ada.moss@bikes.shop', active=1, store_id=3, manager_id=10))
+        self.session.flush()
+        self.assertEqual(self.ids(ancestors(self.session, 11, closure=self.closure)),
+                         [10, 7, 5, 1])
+        self.assertEqual(depth(self.session, 11, closure=self.closure), 4)
+
+
+class TestClosureHierarchy(TestRecursiveHierarchy):
+
+    closure = True
+
+    def closure_rows(self):
+        return set(self.session.execute(select(staff_closure)).all())
+
+    def test_closure_covers_every_pair(self):
+        self.assertEqual(len(self.closure_rows()), 27)
+
+    def test_triggers_match_rebuild(self):
+        self.session.query(Staff).get(7).manager_id = 8
+        self.session.query(Staff).get(2).manager_id = None
+        self.session.flush()
+        maintained = self.closure_rows()
+        rebuild_closure(self.session)
+        self.assertEqual(maintained, self.closure_rows())
+
+    def test_cycles_are_refused(self):
+        self.session.query(Staff).get(5).manager_id = 10
+        with self.assertRaises(IntegrityError):
+            self.session.flush()
+        self.session.rollback()
+        self.assertEqual(self.ids(ancestors(self.session, 10, closure=True)), [7, 5, 1])
@@ -0,0 +1,79 @@
+import unittest
+
+from sqlalchemy.orm import selectinload
+
+from sqlalchemy_example.create_session import *
+from sqlalchemy_example.instrumentation import QueryRecorder, statement_shape
+
+class TestQueryRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.session = build_session(template=True)
+        self.recorder = QueryRecorder()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_statements_are_timed_and_rows_counted(self):
+        with self.recorder.capture(self.session):
+            results = self.session.query(Customer).filter_by(state = 'CA').all()
+        stats, = self.recorder.stats().values()
+        self.assertEqual((stats.count, stats.rows), (1, len(results)))
+        self.assertGreater(stats.total_time, 0)
+        self.assertEqual(len(self.recorder.statements), 1)
+
+    def test_rows_are_counted_around_eager_loads(self):
+        with self.recorder.capture(self.session):
+            categories = self.session.query(Category).options(selectinload(Category.products)) \
+                                     .all()
+        parent, child = self.recorder.statements
+        self.assertEqual(parent['rows'], len(categories))
+        self.assertEqual(child['rows'], sum(len(category.products) for category in categories))
+
+    def test_results_are_unchanged_by_recording(self):
+        with self.recorder.capture(self.session):
+            first = self.session.query(Customer.first_name, Customer.last_name) \
+                                .order_by(Customer.last_name).first()
+            brand = self.session.query(Brand).filter_by(brand_name = 'Electra').one()
+        self.assertEqual(first, ('Jamika', 'Acevedo'))
+        self.assertEqual(brand.brand_id, 1)
+
+    def test_lazy_loads_are_reported_as_n_plus_one(self):
+        with self.recorder.capture(self.session):
+            for category in self.session.query(Category).all():
+                category.products
+        offender, = self.recorder.n_plus_one(threshold=5)
+        self.assertEqual((offender.relationship, offender.count), ('Category.products', 7))
+
+    def test_in_lists_of_different_lengths_share_a_shape(self):
+        with self.recorder.capture(self.session):
+            self.session.query(Product).filter(Product.product_id.in_([1, 2])).all()
+            self.session.query(Product).filter(Product.product_id.in_([1, 2, 3])).all()
+        stats, = self.recorder.stats().values()
+        self.assertEqual((stats.count, stats.rows), (2, 5))
+
+    def test_other_sessions_are_not_recorded(self):
+        other = build_session(template=True)
+        with self.recorder.capture(self.session):
+            other.query(Brand).all()
+        self.assertEqual(self.recorder.stats(), {})
+        other.close()
+
+    def test_lightweight_mode_keeps_aggregates_only(self):
+        recorder = QueryRecorder(lightweight=True)
+        with recorder.capture(self.session.get_bind()):
+            for category in self.session.query(Category).all():
+                category.products
+        self.assertEqual(recorder.statements, [])
+        self.assertEqual(recorder.n_plus_one()[0].count, 7)
+
+    def test_flush_statements_are_recorded(self):
+        with self.recorder.capture(self.session):
+            self.session.add(Brand(brand_id=10, brand_name='test'))
+            self.session.commit()
+        shapes = list(self.recorder.stats())
+        self.assertEqual(shapes, ['INSERT INTO brand (brand_id, brand_name) VALUES (?, ?)'])
+
+    def test_statement_shape_collapses_whitespace_and_in_lists(self):
+        self.assertEqual(statement_shape('SELECT a\nFROM t WHERE a IN (?, ?, ?)'),
+                         'SELECT a FROM t WHERE a IN (?)')
@@ -0,0 +1,66 @@
+import unittest
+
+from sqlalchemy import select
+
+from sqlalchemy_example.create_session import *
+from sqlalchemy_example.iteration import chunked, iter_keyset, keyset_pages, stream
+from sqlalchemy_example.readonly import select_rows
+
+class TestStream(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.session = build_session(template=True)
+
+    def test_chunks_are_bounded(self):
+        chunks = list(stream(self.session, select(Order_Item), 1000))
+        self.assertEqual([len(chunk) for chunk in chunks], [1000, 1000, 1000, 1000, 722])
+        self.assertIsInstance(chunks[0][0], Order_Item)
+
+    def test_legacy_query_streams_rows(self):
+        query = self.session.query(Product.product_name, Order_Item.order_id) \
+                            .outerjoin(Order_Item) \
+                            .order_by(Order_Item.order_id, Product.product_name)
+        rows = [row for chunk in stream(self.session, query, 500) for row in chunk]
+        self.assertEqual(len(rows), 4736)
+        self.assertEqual(tuple(rows[0]), ("Electra Savannah 1 (20-inch) - Girl's - 2018", None))
+
+
+class TestChunked(unittest.TestCase):
+
+    def test_chunked_splits_any_iterable(self):
+        self.assertEqual([len(chunk) for chunk in chunked(range(1201))], [500, 500, 201])
+        self.assertEqual(list(chunked(iter([1, 2, 3]), 2)), [[1, 2], [3]])
+        self.assertEqual(list(chunked([])), [])
+
+
+class TestKeysetPagination(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.session = build_session(template=True)
+
+    def test_pages_cover_every_row_once_in_key_order(self):
+        items = list(iter_keyset(self.session, Order_Item, page_size=700))
+        keys = [(item.order_id, item.item_id) for item in items]
+        self.assertEqual(len(keys), 4722)
+        self.assertEqual(keys, sorted(set(keys)))
+
+    def test_pages_are_bounded(self):
+        sizes = [len(page) for page in keyset_pages(self.session, Stock, page_size=400)]
+        self.assertEqual(sizes, [400, 400, 139])
+
+    def test_filtered_column_statement(self):
+        statement = select_rows(Stock).where(Stock.quantity == 0)
+        rows = list(iter_keyset(self.session, Stock, statement, page_size=10))
+        expected = self.session.query(Stock.store_id, Stock.product_id, Stock.quantity) \
+                               .filter(Stock.quantity == 0) \
+                               .order_by(Stock.store_id, Stock.product_id) \
+                               .all()
+        self.assertEqual([tuple(row) for row in rows], [tuple(row) for row in expected])
+
+    def test_seek_uses_the_primary_key_index(self):
+        plan = self.session.execute('''EXPLAIN QUERY PLAN
+            SELECT * FROM order_item WHERE (order_id, item_id) > (5, 1)
+            ORDER BY order_id, item_id LIMIT 10''').fetchall()
+        self.assertIn('USING INDEX sqlite_autoindex_order_item_1', plan[0][-1])
@@ -7,7 +7,7 @@ class TestJoins(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        cls.session = build_session()
+        cls.session = build_session(template=True)
 
     def test_inner_join_on_related_tables(self):
         results = self.session.query(Product.product_name,
@@ -35,7 +35,7 @@ class TestObjectRelations(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        cls.session = build_session()
+        cls.session = build_session(template=True)
 
     def test_object_relationship_between_Category_and_Product(self):
         results = self.session.query(Category) \
@@ -0,0 +1,59 @@
+import types
+import unittest
+from datetime import date
+
+from sqlalchemy_example.create_session import build_session
+from sqlalchemy_example.load_data import *
+
+class TestReadRows(unittest.TestCase):
+
+    def test_read_rows_is_lazy(self):
+        rows = read_rows('order_item')
+        self.assertIsInstance(rows, types.GeneratorType)
+        self.assertEqual(next(rows), dict(order_id=1, item_id=1, product_id=20,
+                                          quantity=1, list_price=599.99, discount=0.2))
+
+    def test_values_are_converted_from_column_types(self):
+        order = next(read_rows('order'))
+        self.assertEqual(order, dict(order_id=1, customer_id=259, order_status=4,
+                                     order_date=date(2016, 1, 1),
+                                     required_date=date(2016, 1, 3),
+                                     shipped_date=date(2016, 1, 3),
+                                     store_id=1, staff_id=2))
+
+    def test_null_is_converted_for_nullable_columns(self):
+        customer = next(read_rows('customer'))
+        self.assertIsNone(customer['phone'])
+        self.assertEqual(customer['zip_code'], '14127')
+        staff = next(read_rows('staff'))
+        self.assertIsNone(staff['manager_id'])
+
+    def test_quotes_inside_fields_are_kept(self):
+        names = [row['product_name'] for row in read_rows('product')]
+        self.assertIn('Electra Girl\'s Hawaii 1 16" - 2017', names)
+
+    def test_batches_are_bounded(self):
+        sizes = [len(batch) for batch in batches(read_rows('order_item'), 1000)]
+        self.assertEqual(sizes, [1000, 1000, 1000, 1000, 722])
+
+
+class TestParallelLoading(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.session = build_session(bulk=True, workers=2)
+
+    def test_parallel_load_matches_row_counts(self):
+        for model, count in [(Category, 7), (Brand, 9), (Product, 321),
+                             (Customer, 1445), (Store, 3), (Stock, 939),
+                             (Staff, 10), (Order, 1615), (Order_Item, 4722)]:
+            self.assertEqual(self.session.query(model).count(), count)
+
+    def test_parallel_load_keeps_customer_order(self):
+        customer = self.session.query(Customer).filter_by(customer_id = 1).one()
+        self.assertEqual((customer.first_name, customer.last_name), ('Debra', 'Burks'))
+
+    def test_dependencies_follow_foreign_keys(self):
+        tables = Base.metadata.tables
+        self.assertEqual(dependencies(tables['order']), {'customer', 'store', 'staff'})
+        self.assertEqual(dependencies(tables['staff']), {'store'})
@@ -0,0 +1,73 @@
+import unittest
+
+from sqlalchemy import select
+from sqlalchemy.exc import InvalidRequestError
+
+from sqlalchemy_example.create_session import *
+from sqlalchemy_example.instrumentation import QueryRecorder
+from sqlalchemy_example.loading import loader_options, use_profile, with_profile
+
+def render(orders):
+    return [(order.customer.last_name,
+             order.staff.store.store_name,
+             [(item.product.product_name,
+               item.product.brand.brand_name,
+               item.product.category.category_name) for item in order.order_item])
+            for order in orders]
+
+
+class TestLoadingProfiles(unittest.TestCase):
+
+    def setUp(self):
+        self.session = build_session(template=True)
+        self.recorder = QueryRecorder(lightweight=True)
+
+    def tearDown(self):
+        self.session.close()
+
+    def statement_count(self):
+        return sum(stats.count for stats in self.recorder.stats().values())
+
+    def render_orders(self, profile=None):
+        with self.recorder.capture(self.session):
+            query = self.session.query(Order).filter(Order.order_id <= 50)
+            if profile is not None:
+                query = with_profile(query, profile)
+            return render(query.all())
+
+    def test_profiles_render_the_same_result(self):
+        expected = self.render_orders()
+        for profile in ('api', 'reporting', 'strict'):
+            self.session.expunge_all()
+            self.assertEqual(self.render_orders(profile), expected)
+
+    def test_api_profile_uses_a_fixed_number_of_queries(self):
+        self.render_orders('api')
+        self.assertEqual(self.statement_count(), 2)
+
+    def test_reporting_profile_uses_one_query_per_relationship(self):
+        self.render_orders('reporting')
+        self.assertEqual(self.statement_count(), 1 + len(loader_options(Order, 'reporting')))
+
+    def test_strict_profile_raises_on_unplanned_lazy_load(self):
+        order = with_profile(self.session.query(Order), 'strict').first()
+        self.assertRaises(InvalidRequestError, lambda: order.customer.orders)
+
+    def test_use_profile_applies_to_every_select(self):
+        use_profile(self.session, 'api')
+        with self.recorder.capture(self.session):
+            category = self.session.execute(select(Category)).scalars().first()
+            category.products[0].brand.brand_name
+        self.assertEqual(self.statement_count(), 2)
+
+    def test_execution_option_overrides_session_profile(self):
+        use_profile(self.session, 'strict')
+        order = self.session.query(Order) \
+                            .execution_options(loading_profile=None) \
+                            .first()
+        self.assertTrue(order.customer.orders)
+
+    def test_column_queries_are_left_alone(self):
+        use_profile(self.session, 'strict')
+        result = self.session.query(Customer.first_name).filter_by(customer_id = 1).scalar()
+        self.assertEqual(result, 'Debra')
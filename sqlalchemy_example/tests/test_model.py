@@ -1,4 +1,6 @@
+import threading
 import unittest
+from datetime import date
 import sqlalchemy
 from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
@@ -10,7 +12,7 @@ class TestQueries(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        cls.session = build_session()
+        cls.session = build_session(template=True)
 
     def test_database_created_successfully(self):
         self.assertTrue(isinstance(self.session, sqlalchemy.orm.session.Session))
@@ -67,7 +69,7 @@ class TestAdvancedQueries(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        cls.session = build_session()
+        cls.session = build_session(template=True)
 
     def test_select_distinct(self):
         count = self.session.query(Customer.city).distinct().count()
@@ -114,7 +116,7 @@ class TestQueriesWithNull(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        cls.session = build_session()
+        cls.session = build_session(template=True)
 
     def test_select_null_values(self):
         results = self.session.query(Customer.customer_id,
@@ -143,7 +145,7 @@ class TestReturnValues(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        cls.session = build_session()
+        cls.session = build_session(template=True)
 
     def test_all_method_returns_list_of_all_results(self):
         results = self.session.query(Brand).all()
@@ -197,7 +199,7 @@ class TestForeignKeyConstraints(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        cls.session = build_session()
+        cls.session = build_session(template=True)
 
     def setUp(self):
         self.session.rollback()  # needed as this test class raises errors that need to be flushed
@@ -225,3 +227,123 @@ class TestForeignKeyConstraints(unittest.TestCase):
         self.session.delete(brand)
         self.assertRaises(IntegrityError, self.session.commit)
 
+
+
+class TestBulkLoading(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.session = build_session(bulk=True, batch_size=500)
+
+    def test_bulk_load_matches_row_counts(self):
+        for model, count in [(Category, 7), (Brand, 9), (Product, 321),
+                             (Customer, 1445), (Store, 3), (Stock, 939),
+                             (Staff, 10), (Order, 1615), (Order_Item, 4722)]:
+            self.assertEqual(self.session.query(model).count(), count)
+
+    def test_bulk_load_stores_typed_values(self):
+        result = self.session.query(Order.order_id, Order.order_date, Order.shipped_date) \
+                             .filter_by(order_id = 1) \
+                             .one()
+        self.assertEqual(result, (1, date(2016, 1, 1), date(2016, 1, 3)))
+
+    def test_bulk_load_leaves_identity_map_empty(self):
+        self.assertEqual(len(self.session.identity_map), 0)
+
+    def test_bulk_load_enforces_foreign_keys(self):
+        self.session.add(Product(product_name='test',
+                                 brand_id=99999,
+                                 category_id=1,
+                                 model_year=2019,
+                                 list_price=999.99))
+        self.assertRaises(IntegrityError, self.session.commit)
+        self.session.rollback()
+
+
+class TestTemplateSessions(unittest.TestCase):
+
+    def setUp(self):
+        self.first = build_session(template=True)
+        self.second = build_session(template=True)
+
+    def tearDown(self):
+        self.first.close()
+        self.second.close()
+
+    def test_template_session_contains_full_dataset(self):
+        self.assertEqual(self.first.query(Customer).count(), 1445)
+        self.assertEqual(self.first.query(Order_Item).count(), 4722)
+
+    def test_template_sessions_are_isolated(self):
+        self.first.query(Order_Item).delete()
+        self.first.add(Brand(brand_id=10, brand_name='test'))
+        self.first.commit()
+        self.assertEqual(self.first.query(Order_Item).count(), 0)
+        self.assertEqual(self.second.query(Order_Item).count(), 4722)
+        self.assertIsNone(self.second.query(Brand).filter_by(brand_id = 10).one_or_none())
+        third = build_session(template=True)
+        self.assertEqual(third.query(Order_Item).count(), 4722)
+        third.close()
+
+    def test_template_session_enforces_foreign_keys(self):
+        brand = self.first.query(Brand).first()
+        self.first.delete(brand)
+        self.assertRaises(IntegrityError, self.first.commit)
+
+
+class TestSharedDatabase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.database = build_shared_database(template=True, pool_size=4)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.database.dispose()
+
+    def tearDown(self):
+        self.database.readers.remove()
+
+    def test_readers_are_scoped_per_thread(self):
+        sessions = []
+        def read():
+            sessions.append(self.database.readers())
+            self.database.readers.remove()
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+        self.assertIs(self.database.readers(), self.database.readers())
+        self.assertIsNot(sessions[0], self.database.readers())
+
+    def test_concurrent_readers_see_the_loaded_dataset(self):
+        counts = []
+        def read():
+            counts.append(self.database.readers().query(Order_Item).count())
+            self.database.readers.remove()
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counts, [4722] * 8)
+
+    def test_readers_cannot_write(self):
+        session = self.database.readers()
+        session.add(Brand(brand_id=10, brand_name='test'))
+        self.assertRaises(sqlalchemy.exc.OperationalError, session.commit)
+        session.rollback()
+
+    def test_committed_writes_are_visible_to_readers(self):
+        writer = self.database.writer()
+        writer.add(Category(category_id=8, category_name='test'))
+        writer.commit()
+        self.assertEqual(self.database.readers().query(Category).count(), 8)
+        writer.query(Category).filter_by(category_id = 8).delete()
+        writer.commit()
+        writer.close()
+
+    def test_writer_enforces_foreign_keys(self):
+        writer = self.database.writer()
+        writer.delete(writer.query(Brand).first())
+        self.assertRaises(IntegrityError, writer.commit)
+        writer.close()
@@ -0,0 +1,156 @@
+import threading
+import unittest
+from datetime import date
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from sqlalchemy_example.benchmarks.placement import order_requests
+from sqlalchemy_example.create_session import *
+from sqlalchemy_example.placement import OrderRequest, Shortage, place_orders
+
+class TestPlaceOrders(unittest.TestCase):
+
+    def setUp(self):
+        self.session = build_session(template=True)
+
+    def tearDown(self):
+        self.session.close()
+
+    def quantity(self, store_id, product_id):
+        self.session.expire_all()
+        return self.session.query(Stock).get((store_id, product_id)).quantity
+
+    def test_orders_are_placed_and_stock_reserved(self):
+        placement = place_orders(self.session,
+                                 [OrderRequest(1, 1, 2, [(2, 1), (3, 2, 0.1)]),
+                                  OrderRequest(2, 1, 2, [(2, 1)])],
+                                 today=date(2019, 1, 1))
+        self.assertEqual(placement.placed, [(0, 1616), (1, 1617)])
+        self.assertEqual(placement.failed, [])
+        self.assertEqual((self.quantity(1, 2), self.quantity(1, 3)), (3, 4))
+        order = self.session.query(Order).get(1616)
+        self.assertEqual((order.order_status, order.order_date, order.required_date),
+                         (1, date(2019, 1, 1), date(2019, 1, 4)))
+        self.assertEqual([(item.item_id, item.product_id, item.quantity, item.list_price,
+                           item.discount) for item in order.order_item],
+                         [(1, 2, 1, 749.99, 0), (2, 3, 2, 999.99, 0.1)])
+
+    def test_failures_are_reported_per_order(self):
+        placement = place_orders(self.session,
+                                 [OrderRequest(1, 1, 2, [(2, 4)]),
+                                  OrderRequest(1, 1, 2, [(2, 2), (3, 1)]),
+                                  OrderRequest(1, 1, 2, []),
+                                  OrderRequest(1, 1, 2, [(999, 1)]),
+                                  OrderRequest(1, 1, 2, [(3, 0)]),
+                                  OrderRequest(1, 1, 2, [(3, 6)])])
+        self.assertEqual([index for index, order_id in placement.placed], [0, 5])
+        failures = {failure.index: failure for failure in placement.failed}
+        self.assertEqual(failures[1].reason, 'insufficient stock')
+        self.assertEqual(failures[1].shortages, [Shortage(2, 2, 1)])
+        self.assertEqual(failures[2].reason, 'no lines')
+        self.assertEqual(failures[3].reason, 'unknown product 999')
+        self.assertIn('must be positive', failures[4].reason)
+        self.assertEqual((self.quantity(1, 2), self.quantity(1, 3)), (1, 0))
+        self.assertEqual(self.session.query(Order).count(), 1617)
+
+    def test_unknown_references_fail_their_own_order(self):
+        placement = place_orders(self.session,
+                                 [OrderRequest(1, 1, 2, [(2, 1)]),
+                                  OrderRequest(9999, 1, 2, [(2, 1)]),
+                                  OrderRequest(1, 99, 2, [(2, 1)]),
+                                  OrderRequest(1, 1, 99, [(2, 1)]),
+                                  OrderRequest(None, 1, 2, [(2, 1)])])
+        self.assertEqual(placement.placed, [(0, 1616), (4, 1617)])
+        self.assertEqual([(failure.index, failure.reason) for failure in placement.failed],
+                         [(1, 'unknown customer 9999'), (2, 'unknown store 99'),
+                          (3, 'unknown staff 99')])
+        self.assertEqual(self.quantity(1, 2), 3)
+        self.assertEqual(len(self.session.query(Order).get(1616).order_item), 1)
+
+    def test_errors_roll_the_batch_back(self):
+        def fail_items(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('INSERT INTO order_item'):
+                raise ValueError('disk on fire')
+        event.listen(self.session.bind, 'before_cursor_execute', fail_items)
+        with self.assertRaises(ValueError):
+            place_orders(self.session, [OrderRequest(1, 1, 2, [(2, 1)])])
+        event.remove(self.session.bind, 'before_cursor_execute', fail_items)
+        self.session.commit()
+        self.assertEqual(self.quantity(1, 2), 5)
+        self.assertEqual(self.session.query(Order).count(), 1615)
+
+    def test_stock_is_never_oversold(self):
+        requests = order_requests(self.session, 2000, seed=1)
+        placement = place_orders(self.session, requests)
+        self.assertTrue(placement.failed)
+        self.assertEqual(self.session.query(Stock).filter(Stock.quantity < 0).count(), 0)
+        self.assertEqual(self.session.query(Order).count(), 1615 + len(placement.placed))
+
+    def test_conflicting_change_is_retried(self):
+        changed = []
+        def change_stock(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('UPDATE stock') and not changed:
+                changed.append(statement)
+                cursor.connection.execute('UPDATE stock SET quantity = 1 '
+                                          'WHERE store_id = 1 AND product_id = 2')
+        event.listen(self.session.bind, 'before_cursor_execute', change_stock)
+        placement = place_orders(self.session, [OrderRequest(1, 1, 2, [(2, 1)])])
+        self.assertEqual(len(changed), 1)
+        self.assertEqual(len(placement.placed), 1)
+        self.assertEqual(self.quantity(1, 2), 4)
+
+
+class TestConcurrentPlacement(unittest.TestCase):
+
+    def setUp(self):
+        self.database = build_shared_database(template=True)
+
+    def tearDown(self):
+        self.database.dispose()
+
+    def test_commit_by_another_writer_is_retried(self):
+        engine = create_engine('sqlite:///' + self.database.path)
+        session = Session(bind=engine)
+        changed = []
+        def commit_elsewhere(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('UPDATE stock') and not changed:
+                changed.append(statement)
+                writer = self.database.writer()
+                writer.query(Stock).get((1, 2)).quantity -= 1
+                writer.commit()
+                writer.close()
+        event.listen(engine, 'before_cursor_execute', commit_elsewhere)
+        try:
+            placement = place_orders(session, [OrderRequest(1, 1, 2, [(2, 1)])])
+            self.assertEqual(len(changed), 1)
+            self.assertEqual(len(placement.placed), 1)
+            self.assertEqual(session.query(Stock).get((1, 2)).quantity, 3)
+        finally:
+            session.close()
+            engine.dispose()
+
+    def test_concurrent_writers(self):
+        session = self.database.writer()
+        requests = order_requests(session, 400, seed=2)
+        session.close()
+        placements = []
+        def write(batches):
+            for batch in batches:
+                writer = self.database.writer()
+                placements.append(place_orders(writer, batch))
+                writer.close()
+        batches = [requests[start:start + 50] for start in range(0, 400, 50)]
+        threads = [threading.Thread(target=write, args=(batches[index::4],)) for index in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        session = self.database.readers()
+        try:
+            placed = sum(len(placement.placed) for placement in placements)
+            self.assertEqual(placed + sum(len(placement.failed) for placement in placements), 400)
+            self.assertEqual(session.query(Order).count(), 1615 + placed)
+            self.assertEqual(session.query(Stock).filter(Stock.quantity < 0).count(), 0)
+        finally:
+            self.database.readers.remove()
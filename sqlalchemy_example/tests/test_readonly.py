@@ -0,0 +1,46 @@
+import unittest
+
+from sqlalchemy_example.create_session import *
+from sqlalchemy_example.readonly import fetch_rows, iter_rows, row_class, select_rows
+
+class TestReadOnlyRows(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.session = build_session(template=True)
+
+    def setUp(self):
+        self.session.expunge_all()
+
+    def test_rows_match_entities(self):
+        rows = fetch_rows(self.session, Customer)
+        entities = self.session.query(Customer).order_by(Customer.customer_id).all()
+        self.assertEqual(len(rows), 1445)
+        self.assertEqual([(row.customer_id, row.first_name, row.email) for row in rows],
+                         [(entity.customer_id, entity.first_name, entity.email)
+                          for entity in entities])
+
+    def test_rows_skip_the_identity_map(self):
+        rows = fetch_rows(self.session, Order_Item)
+        self.assertEqual(len(rows), 4722)
+        self.assertEqual(len(self.session.identity_map), 0)
+
+    def test_rows_are_immutable(self):
+        row = fetch_rows(self.session, Brand)[0]
+        self.assertEqual((row.brand_id, row.brand_name), (1, 'Electra'))
+        self.assertRaises(AttributeError, setattr, row, 'brand_name', 'test')
+
+    def test_statement_can_be_refined(self):
+        statement = select_rows(Customer).filter_by(state = 'CA') \
+                                         .order_by(Customer.last_name, Customer.customer_id)
+        rows = fetch_rows(self.session, Customer, statement)
+        self.assertEqual(len(rows), 284)
+        self.assertEqual((rows[0].first_name, rows[0].last_name), ('Ester', 'Acevedo'))
+
+    def test_iter_rows_is_lazy(self):
+        rows = iter_rows(self.session, Order)
+        self.assertEqual(next(rows).order_id, 1)
+
+    def test_row_class_fields_follow_the_model(self):
+        self.assertEqual(row_class(Stock)._fields, ('store_id', 'product_id', 'quantity'))
+        self.assertIs(row_class(Stock), row_class(Stock))
@@ -0,0 +1,157 @@
+import threading
+import unittest
+
+from sqlalchemy import update
+
+from sqlalchemy_example.create_session import *
+from sqlalchemy_example.instrumentation import QueryRecorder
+from sqlalchemy_example.references import ReferenceCache
+
+class TestReferenceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.session = build_session(template=True)
+        self.now = 0.0
+        self.cache = ReferenceCache(max_size=8, ttl=60, clock=lambda: self.now)
+        self.cache.track(self.session)
+
+    def tearDown(self):
+        self.session.close()
+
+    def statements(self, func):
+        with QueryRecorder().capture(self.session) as recorder:
+            result = func()
+        return result, sum(stats.count for stats in recorder.stats().values())
+
+    def test_lookups_read_through_once(self):
+        row, count = self.statements(lambda: self.cache.get(self.session, Brand, 1))
+        self.assertEqual((row.brand_id, row.brand_name, count), (1, 'Electra', 1))
+        row, count = self.statements(lambda: self.cache.get(self.session, Brand, 1))
+        self.assertEqual((row.brand_name, count), ('Electra', 0))
+        stats = self.cache.stats()
+        self.assertEqual((stats.hits, stats.misses, stats.hit_ratio), (1, 1, 0.5))
+
+    def test_rows_are_immutable_and_detached(self):
+        row = self.cache.get(self.session, Store, 1)
+        with self.assertRaises(AttributeError):
+            row.store_name = 'Renamed'
+        self.assertEqual(len(self.session.identity_map), 0)
+
+    def test_get_many_loads_misses_together(self):
+        self.cache.get(self.session, Staff, 1)
+        rows, count = self.statements(lambda: self.cache.get_many(self.session, Staff,
+                                                                  [1, 2, 3, 99]))
+        self.assertEqual(sorted(rows), [1, 2, 3])
+        self.assertEqual(count, 1)
+        self.assertIsNone(self.statements(lambda: self.cache.get(self.session, Staff, 99))[0])
+        self.assertEqual(self.cache.stats().misses, 4)
+
+    def test_only_reference_models_are_cached(self):
+        with self.assertRaises(KeyError):
+            self.cache.get(self.session, Product, 1)
+
+    def test_entries_expire(self):
+        self.cache.get(self.session, Category, 1)
+        self.now = 61
+        self.assertEqual(self.statements(lambda: self.cache.get(self.session, Category, 1))[1], 1)
+        self.assertEqual(self.cache.stats().evictions, 1)
+
+    def test_least_recently_used_are_evicted(self):
+        self.cache.get_many(self.session, Staff, range(1, 9))
+        self.cache.get(self.session, Staff, 1)
+        self.cache.get(self.session, Staff, 9)
+        self.assertEqual(self.cache.stats().size, 8)
+        self.assertEqual(self.statements(lambda: self.cache.get(self.session, Staff, 1))[1], 0)
+        self.assertEqual(self.statements(lambda: self.cache.get(self.session, Staff, 2))[1], 1)
+
+    def test_commit_invalidates_changed_rows(self):
+        self.cache.get_many(self.session, Brand, [1, 2])
+        self.session.query(Brand).get(1).brand_name = 'Renamed'
+        self.session.commit()
+        self.assertEqual(self.cache.get(self.session, Brand, 1).brand_name, 'Renamed')
+        self.assertEqual(self.statements(lambda: self.cache.get(self.session, Brand, 2))[1], 0)
+
+    def test_rollback_drops_uncommitted_rows(self):
+        self.session.query(Brand).get(1).brand_name = 'Uncommitted'
+        self.session.flush()
+        self.assertEqual(self.cache.get(self.session, Brand, 1).brand_name, 'Uncommitted')
+        self.session.rollback()
+        self.assertEqual(self.cache.get(self.session, Brand, 1).brand_name, 'Electra')
+
+    def test_new_rows_replace_cached_misses(self):
+        self.assertIsNone(self.cache.get(self.session, Category, 99))
+        self.session.add(Category(category_id=99, category_name='Tandems'))
+        self.session.commit()
+        self.assertEqual(self.cache.get(self.session, Category, 99).category_name, 'Tandems')
+
+    def test_core_statements_invalidate_the_table(self):
+        self.cache.get_many(self.session, Store, [1, 2])
+        self.cache.get(self.session, Brand, 1)
+        self.session.execute(Store.__table__.update().values(phone=None))
+        self.session.commit()
+        self.assertIsNone(self.cache.get(self.session, Store, 2).phone)
+        self.assertEqual(self.statements(lambda: self.cache.get(self.session, Brand, 1))[1], 0)
+
+    def test_orm_statements_invalidate_the_table(self):
+        self.cache.get(self.session, Brand, 1)
+        self.session.query(Brand).filter_by(brand_id=1).update({'brand_name': 'X'})
+        self.session.commit()
+        self.assertEqual(self.cache.get(self.session, Brand, 1).brand_name, 'X')
+        self.session.execute(update(Brand).where(Brand.brand_id == 1).values(brand_name='Y'))
+        self.session.commit()
+        self.assertEqual(self.cache.get(self.session, Brand, 1).brand_name, 'Y')
+        self.session.add(Brand(brand_id=10, brand_name='Z'))
+        self.session.commit()
+        self.assertEqual(self.cache.get(self.session, Brand, 10).brand_name, 'Z')
+        self.session.query(Brand).filter_by(brand_id=10).delete()
+        self.session.commit()
+        self.assertIsNone(self.cache.get(self.session, Brand, 10))
+
+    def test_invalidation_during_a_load_is_not_overwritten(self):
+        load = self.cache._load
+        def racing_load(session, model, keys):
+            rows = load(session, model, keys)
+            # another session commits a change after the rows were read
+            self.cache.invalidate(model, 1)
+            return rows
+        self.cache._load = racing_load
+        self.assertEqual(self.cache.get(self.session, Brand, 1).brand_name, 'Electra')
+        self.cache._load = load
+        self.assertEqual(self.statements(lambda: self.cache.get(self.session, Brand, 1))[1], 1)
+
+    def test_uncommitted_rows_are_not_shared(self):
+        database = build_shared_database(template=True)
+        self.addCleanup(database.dispose)
+        writer = self.cache.track(database.writer())
+        reader = database.readers()
+        try:
+            writer.query(Brand).get(1).brand_name = 'Unflushed'
+            self.cache.get(writer, Brand, 1)
+            self.assertEqual(self.cache.stats().size, 0)
+            writer.flush()
+            writer.query(Brand).get(2).brand_name = 'Uncommitted'
+            writer.flush()
+            self.assertEqual(self.cache.get(writer, Brand, 2).brand_name, 'Uncommitted')
+            self.assertEqual(self.cache.stats().size, 0)
+            self.assertEqual(self.cache.get(reader, Brand, 2).brand_name, 'Haro')
+            writer.rollback()
+            self.assertEqual(self.cache.get(writer, Brand, 1).brand_name, 'Electra')
+            self.assertEqual(self.cache.get(writer, Brand, 2).brand_name, 'Haro')
+        finally:
+            writer.close()
+            database.readers.remove()
+
+    def test_concurrent_lookups(self):
+        rows = []
+        sessions = [build_session(template=True) for _ in range(4)]
+        threads = [threading.Thread(target=lambda session=session: rows.append(
+                       self.cache.get_many(session, Staff, range(1, 11))))
+                   for session in sessions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for session in sessions:
+            session.close()
+        self.assertEqual(len(rows), 4)
+        self.assertTrue(all(len(found) == 10 for found in rows))
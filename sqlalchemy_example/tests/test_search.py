@@ -0,0 +1,66 @@
+import unittest
+
+from sqlalchemy_example.create_session import *
+from sqlalchemy_example.search import enable_search, match_expression, search_products
+
+class TestProductSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.session = enable_search(build_session(template=True))
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_search_matches_like_filter(self):
+        results = search_products(self.session, 'Cruiser', limit=None, prefix=False)
+        expected = self.session.query(Product) \
+                               .filter(Product.product_name.like('%Cruiser%')) \
+                               .all()
+        self.assertEqual(sorted(product.product_id for product in results),
+                         sorted(product.product_id for product in expected))
+
+    def test_product_name_ranks_above_category(self):
+        results = search_products(self.session, 'cruiser', limit=None)
+        self.assertEqual(len(results), 80)
+        self.assertIn('Cruiser', results[0].product_name)
+        self.assertNotIn('Cruiser', results[-1].product_name)
+
+    def test_search_on_brand_and_category(self):
+        results = search_products(self.session, 'trek children', limit=None)
+        self.assertTrue(results)
+        for product in results:
+            self.assertEqual(product.brand.brand_name, 'Trek')
+            self.assertEqual(product.category.category_name, 'Children Bicycles')
+
+    def test_user_input_is_quoted(self):
+        self.assertEqual(match_expression('electra "AND cruis*'), '"electra"* "AND"* "cruis"*')
+        self.assertEqual(search_products(self.session, '"NOT OR* ('), [])
+        self.assertEqual(search_products(self.session, '  '), [])
+
+    def test_index_follows_product_changes(self):
+        product = self.session.query(Product).get(233)
+        product.product_name = 'Zzyzx Special'
+        new = Product(product_name='Zzyzx Tandem', brand_id=2, category_id=1, model_year=2020,
+                      list_price=999.99)
+        self.session.add(new)
+        self.session.flush()
+        self.assertEqual([result.product_id for result in search_products(self.session, 'zzyzx')],
+                         [233, new.product_id])
+        self.session.delete(new)
+        self.session.flush()
+        self.assertEqual([result.product_id for result in search_products(self.session, 'zzyzx')],
+                         [233])
+
+    def test_index_follows_brand_rename(self):
+        brand = self.session.query(Brand).filter_by(brand_name='Electra').one()
+        count = len(brand.products)
+        brand.brand_name = 'Qwerty'
+        self.session.flush()
+        results = search_products(self.session, 'qwerty', limit=None)
+        self.assertEqual(len(results), count)
+        self.assertEqual({product.brand_id for product in results}, {brand.brand_id})
+
+    def test_enable_search_is_idempotent(self):
+        enable_search(self.session)
+        self.assertEqual(len(search_products(self.session, 'Cruiser', limit=None, prefix=False)),
+                         19)
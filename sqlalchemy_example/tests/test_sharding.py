@@ -0,0 +1,161 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+
+from sqlalchemy import func, select
+
+from sqlalchemy_example.create_session import *
+from sqlalchemy_example import sharding
+from sqlalchemy_example.placement import OrderRequest, place_orders
+from sqlalchemy_example.sharding import (build_shards, order_id_range, revenue_by_month,
+                                         stock_by_product, units_by_product)
+
+class TestShards(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.shards = build_shards(template=True)
+        cls.session = build_session(template=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.session.close()
+        cls.shards.dispose()
+
+    def test_each_shard_holds_one_store(self):
+        self.assertEqual(self.shards.store_ids, [1, 2, 3])
+        orders = items = 0
+        for store_id in self.shards.store_ids:
+            session = self.shards.session(store_id)
+            try:
+                self.assertEqual({store for (store,) in session.query(Order.store_id).distinct()},
+                                 {store_id})
+                self.assertEqual({store for (store,) in session.query(Stock.store_id).distinct()},
+                                 {store_id})
+                self.assertEqual(session.query(Customer).count(), 1445)
+                self.assertEqual(session.query(Staff).count(), 10)
+                orders += session.query(Order).count()
+                items += session.query(Order_Item).count()
+            finally:
+                session.close()
+        self.assertEqual((orders, items), (1615, 4722))
+
+    def test_revenue_by_month_matches_unsharded(self):
+        month = func.strftime('%Y-%m', Order.order_date)
+        revenue = func.sum(Order_Item.quantity * Order_Item.list_price * (1 - Order_Item.discount))
+        expected = self.session.query(month, func.count(Order.order_id.distinct()),
+                                      func.sum(Order_Item.quantity), revenue) \
+                               .join(Order_Item) \
+                               .group_by(month) \
+                               .order_by(month) \
+                               .all()
+        results = revenue_by_month(self.shards)
+        self.assertEqual([row[:3] for row in results], [tuple(row[:3]) for row in expected])
+        for row, expected_row in zip(results, expected):
+            self.assertAlmostEqual(row[3], expected_row[3], places=4)
+
+    def test_product_totals_match_unsharded(self):
+        units = dict(self.session.query(Order_Item.product_id, func.sum(Order_Item.quantity))
+                                 .group_by(Order_Item.product_id))
+        self.assertEqual({row[0]: row[1] for row in units_by_product(self.shards)}, units)
+        stock = dict(self.session.query(Stock.product_id, func.sum(Stock.quantity))
+                                 .group_by(Stock.product_id))
+        self.assertEqual(dict(stock_by_product(self.shards)), stock)
+
+    def test_scatter_binds_parameters(self):
+        statement = select(func.count()).select_from(Order) \
+                                        .where(Order.order_date >= date(2018, 1, 1))
+        counts = {store_id: rows[0][0] for store_id, rows in self.shards.scatter(statement).items()}
+        self.assertEqual(sum(counts.values()),
+                         self.session.query(Order).filter(Order.order_date >= date(2018, 1, 1))
+                                                  .count())
+        self.assertEqual(self.shards.scatter_gather(statement, keys=0), [(sum(counts.values()),)])
+
+    def test_scatter_expands_in_lists(self):
+        statement = select(Order_Item.product_id, func.sum(Order_Item.quantity)) \
+            .where(Order_Item.product_id.in_([2, 3, 5])) \
+            .group_by(Order_Item.product_id)
+        expected = self.session.query(Order_Item.product_id, func.sum(Order_Item.quantity)) \
+                               .filter(Order_Item.product_id.in_([2, 3, 5])) \
+                               .group_by(Order_Item.product_id) \
+                               .order_by(Order_Item.product_id) \
+                               .all()
+        self.assertEqual(self.shards.scatter_gather(statement), [tuple(row) for row in expected])
+
+
+class TestShardWrites(unittest.TestCase):
+
+    def test_writes_go_to_one_shard(self):
+        shards = build_shards(template=True, workers=0)
+        directory = os.path.dirname(shards.paths[1])
+        try:
+            session = shards.session(2)
+            placement = place_orders(session, [OrderRequest(1, 2, 6, [(2, 1)])])
+            session.close()
+            self.assertEqual(len(placement.placed), 1)
+            counts = shards.scatter(select(func.count()).select_from(Order))
+            self.assertEqual(counts[2][0][0], 1094)
+            self.assertEqual(counts[1][0][0], 348)
+        finally:
+            shards.dispose()
+        self.assertFalse(os.path.exists(directory))
+
+    def test_new_order_ids_are_unique_across_shards(self):
+        shards = build_shards(template=True, workers=0)
+        try:
+            order_ids = {}
+            for store_id, staff_id in ((1, 2), (2, 6)):
+                session = shards.session(store_id)
+                placement = place_orders(session, [OrderRequest(1, store_id, staff_id, [(2, 1)]),
+                                                   OrderRequest(2, store_id, staff_id, [(2, 1)])])
+                order = Order(customer_id=3, order_status=1, order_date=date(2019, 1, 1),
+                              required_date=date(2019, 1, 4), store_id=store_id,
+                              staff_id=staff_id)
+                session.add(order)
+                session.commit()
+                order_ids[store_id] = [order_id for index, order_id in placement.placed] \
+                    + [order.order_id]
+                session.close()
+            first, last = order_id_range(1)
+            self.assertEqual(order_ids[1], [first, first + 1, first + 2])
+            self.assertEqual(order_ids[2], [last + 1, last + 2, last + 3])
+            self.assertEqual(order_id_range(2)[0], last + 1)
+            counts = shards.scatter_gather(select(Order.order_id, func.count())
+                                           .group_by(Order.order_id))
+            self.assertEqual(len(counts), 1615 + 6)
+            self.assertTrue(all(count == 1 for order_id, count in counts))
+        finally:
+            shards.dispose()
+
+    def test_paths_are_quoted(self):
+        base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base)
+        directory = os.path.join(base, 'a?b#c%20d')
+        os.mkdir(directory)
+        shards = build_shards(directory, template=True)
+        try:
+            count = select(func.count()).select_from(Order)
+            self.assertEqual(shards.scatter_gather(count, keys=0), [(1615,)])
+            session = shards.session(1)
+            self.assertEqual(session.query(Order).count(), 348)
+            session.close()
+        finally:
+            shards.dispose()
+        self.assertEqual(sorted(name for name in os.listdir(directory)
+                                if name.endswith('.sqlite')),
+                         ['store-1.sqlite', 'store-2.sqlite', 'store-3.sqlite'])
+
+    def test_failed_build_removes_its_directory(self):
+        created, real_mkdtemp = [], tempfile.mkdtemp
+        def mkdtemp(**kwargs):
+            created.append(real_mkdtemp(**kwargs))
+            return created[-1]
+        with mock.patch.object(sharding, 'ORDER_ID_BLOCK', 100), \
+                mock.patch('tempfile.mkdtemp', mkdtemp):
+            with self.assertRaises(ValueError):
+                build_shards(template=True)
+        self.assertEqual(len(created), 1)
+        self.assertFalse(os.path.exists(created[0]))
@@ -0,0 +1,82 @@
+import unittest
+
+from sqlalchemy import bindparam, select
+
+from sqlalchemy_example.create_session import *
+from sqlalchemy_example.statements import StatementRegistry, execute, registry
+
+class TestRegisteredStatements(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.session = build_session(template=True)
+
+    def test_customer_names_by_state(self):
+        results = execute(self.session, 'customer_names_by_state', state='CA').all()
+        self.assertEqual(len(results), 284)
+        self.assertEqual(results[0], ('Ester', 'Acevedo'))
+
+    def test_customers_by_state_returns_entities(self):
+        results = execute(self.session, 'customers_by_state', state='TX').scalars().all()
+        self.assertEqual(len(results), 142)
+        self.assertTrue(all(isinstance(result, Customer) for result in results))
+
+    def test_city_counts(self):
+        results = execute(self.session, 'city_counts', state='CA').all()
+        self.assertEqual(len(results), 40)
+        self.assertEqual(results[0], ('Anaheim', 11))
+        self.assertEqual(results[-1], ('Yuba City', 1))
+
+    def test_cities_with_more_customers_than(self):
+        results = execute(self.session, 'cities_with_more_customers_than', state='CA',
+                          min_count=10).all()
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[-1], ('Upland', 11))
+
+    def test_products_by_category_and_year(self):
+        results = execute(self.session, 'products_by_category_and_year', category_id=6,
+                          model_year=2018).scalars().all()
+        expected = self.session.query(Product).filter_by(category_id = 6, model_year = 2018) \
+                               .order_by(Product.product_id).all()
+        self.assertEqual(results, expected)
+
+    def test_parameters_are_not_cached_with_the_statement(self):
+        self.assertNotEqual(execute(self.session, 'city_counts', state='NY').all(),
+                            execute(self.session, 'city_counts', state='TX').all())
+
+
+class TestCacheStatistics(unittest.TestCase):
+
+    def setUp(self):
+        self.session = build_session(template=True)
+        self.registry = StatementRegistry()
+        self.registry.register('brand_names', lambda: select(Brand.brand_name)
+                               .where(Brand.brand_id <= bindparam('brand_id')))
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_repeated_executions_hit_the_compiled_cache(self):
+        for brand_id in range(1, 6):
+            self.assertEqual(len(self.registry.execute(self.session, 'brand_names',
+                                                       brand_id=brand_id).all()), brand_id)
+        stats = self.registry.stats()['brand_names']
+        self.assertEqual((stats.executions, stats.hits, stats.misses), (5, 4, 1))
+        self.assertEqual(self.registry.hit_ratio(), 0.8)
+
+    def test_other_statements_are_not_counted(self):
+        self.registry.execute(self.session, 'brand_names', brand_id=1).all()
+        self.session.query(Brand).all()
+        self.assertEqual(self.registry.stats()['brand_names'].executions, 1)
+        self.assertNotIn('city_counts', self.registry.stats())
+
+    def test_reset(self):
+        self.registry.execute(self.session, 'brand_names', brand_id=1).all()
+        self.registry.reset()
+        self.assertEqual(self.registry.stats()['brand_names'], (0, 0, 0, 0))
+        self.assertEqual(self.registry.hit_ratio(), 0.0)
+
+    def test_names_are_unique(self):
+        with self.assertRaises(KeyError):
+            self.registry.register('brand_names', lambda: select(Brand))
+        self.assertIn('city_counts', registry.names())
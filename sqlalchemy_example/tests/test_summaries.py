@@ -0,0 +1,101 @@
+import unittest
+from datetime import date
+
+from sqlalchemy import func, select
+
+from sqlalchemy_example.create_session import *
+from sqlalchemy_example.summaries import (brand_category_sales, check_summaries,
+                                          enable_summaries, main, product_month_sales,
+                                          rebuild_summaries, store_day_sales)
+
+class TestSalesSummaries(unittest.TestCase):
+
+    def setUp(self):
+        self.session = enable_summaries(build_session(template=True))
+
+    def tearDown(self):
+        self.session.close()
+
+    def assertConsistent(self):
+        self.session.flush()
+        self.assertEqual(check_summaries(self.session), [])
+
+    def store_day(self, store_id, order_date):
+        return self.session.execute(
+            select(store_day_sales.c.revenue, store_day_sales.c.units)
+            .where(store_day_sales.c.store_id == store_id)
+            .where(store_day_sales.c.order_date == order_date)).first()
+
+    def new_order(self):
+        order = Order(customer_id=1, order_status=1, order_date=date(2030, 1, 1),
+                      required_date=date(2030, 1, 3), store_id=1, staff_id=2)
+        order.order_item = [
+            Order_Item(item_id=1, product_id=1, quantity=2, list_price=100.0, discount=0.1),
+            Order_Item(item_id=2, product_id=5, quantity=1, list_price=50.0, discount=0.0)]
+        self.session.add(order)
+        return order
+
+    def test_rebuilt_summaries_match_order_items(self):
+        self.assertEqual(check_summaries(self.session), [])
+        units = self.session.query(func.sum(Order_Item.quantity)).scalar()
+        for table in (store_day_sales, product_month_sales, brand_category_sales):
+            self.assertEqual(self.session.execute(select(func.sum(table.c.units))).scalar(), units)
+
+    def test_inserted_orders_are_added(self):
+        self.new_order()
+        self.assertConsistent()
+        self.assertEqual(self.store_day(1, date(2030, 1, 1)), (230.0, 3))
+
+    def test_updated_items_are_adjusted(self):
+        item = self.session.query(Order_Item).get((1, 1))
+        item.quantity += 3
+        item.discount = 0.5
+        self.assertConsistent()
+
+    def test_deleted_items_are_removed(self):
+        order = self.new_order()
+        self.session.flush()
+        for item in order.order_item:
+            self.session.delete(item)
+        self.assertConsistent()
+        self.assertIsNone(self.store_day(1, date(2030, 1, 1)))
+
+    def test_moved_orders_move_their_items(self):
+        order = self.new_order()
+        self.session.flush()
+        order.store_id = 2
+        order.order_date = date(2030, 2, 1)
+        self.assertConsistent()
+        self.assertIsNone(self.store_day(1, date(2030, 1, 1)))
+        self.assertEqual(self.store_day(2, date(2030, 2, 1)), (230.0, 3))
+
+    def test_rebranded_products_move_their_items(self):
+        self.session.query(Product).get(20).brand_id = 2
+        self.assertConsistent()
+
+    def test_rollback_discards_summary_changes(self):
+        self.session.query(Order_Item).get((1, 1)).quantity = 50
+        self.session.flush()
+        self.session.rollback()
+        self.assertEqual(check_summaries(self.session), [])
+
+    def test_core_changes_are_detected_and_rebuilt(self):
+        self.session.execute(Order_Item.__table__.update()
+                             .where(Order_Item.order_id == 1)
+                             .values(quantity=Order_Item.quantity + 1))
+        mismatches = check_summaries(self.session)
+        self.assertEqual({mismatch.table for mismatch in mismatches},
+                         {'store_day_sales', 'product_month_sales', 'brand_category_sales'})
+        rebuild_summaries(self.session)
+        self.assertEqual(check_summaries(self.session), [])
+
+
+class TestSummariesCommand(unittest.TestCase):
+
+    def test_rebuild_then_check(self):
+        database = build_shared_database(template=True)
+        try:
+            self.assertEqual(main([database.path]), 0)
+            self.assertEqual(main([database.path, '--check']), 0)
+        finally:
+            database.dispose()